@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import llm_client
+from prompt_context import TableContextBuilder
+from query_handler import QueryHandler
+from response_cache import ResponseCache
+from retrieval import DocumentRetriever
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def read_questions(path: str) -> List[Dict[str, Any]]:
+    """Read a JSONL file of {"question": ..., "id": ...} records; id defaults to the line number."""
+    questions = []
+    with open(path, "r", encoding="utf-8") as questions_file:
+        for line_number, line in enumerate(questions_file, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"question": record}
+            record.setdefault("id", line_number)
+            questions.append(record)
+    return questions
+
+
+def latency_report(results: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles of a batch run."""
+    succeeded = [r for r in results if r["error"] is None]
+    report: Dict[str, Any] = {
+        "questions": len(results),
+        "errors": len(results) - len(succeeded),
+        "cached": sum(1 for r in succeeded if r["cached"]),
+        "wall_time": wall_time,
+        "throughput_per_second": len(results) / wall_time if wall_time else None,
+    }
+    for field in ("latency", "time_to_first_token"):
+        values = [r[field] for r in succeeded if r[field] is not None]
+        if values:
+            for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                report[f"{field}_p{p}"] = float(value)
+    return report
+
+
+class BatchRunner:
+    """Runs a set of questions over loaded files without the GUI.
+
+    Every question gets its own QueryHandler, so answers do not depend on the order
+    the questions ran in; the handlers share the response cache, table profiles and
+    document indexes. At most concurrency questions are answered at once, each
+    within timeout seconds.
+    """
+    def __init__(self, app: Any, concurrency: int = 4, timeout: float = 120.0, use_cache: bool = True):
+        self.app = app
+        self.concurrency: int = concurrency
+        self.timeout: float = timeout
+        # Shared by all questions
+        self.response_cache: Optional[ResponseCache] = ResponseCache() if use_cache else None
+        self.context_builder: TableContextBuilder = TableContextBuilder()
+        self.retriever: DocumentRetriever = app.query_handler.retriever  # Already indexed the loaded documents
+
+    async def _answer(self, record: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        handler = QueryHandler(use_cache=self.response_cache is not None, response_cache=self.response_cache,
+                               context_builder=self.context_builder, retriever=self.retriever)
+        result: Dict[str, Any] = {"id": record["id"], "question": record["question"], "answer": None, "error": None,
+                                  "latency": None, "time_to_first_token": None, "cached": False, "stages": {}}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                chunks = []
+
+                async def consume() -> None:
+                    async for chunk in self.app.astream_query(record["question"], query_handler=handler):
+                        chunks.append(chunk)
+
+                await asyncio.wait_for(consume(), self.timeout)
+                result["answer"] = "".join(chunks).strip()
+                result["latency"] = time.perf_counter() - start
+                if handler.last_timing is not None:
+                    result["time_to_first_token"] = handler.last_timing.time_to_first_token
+                    result["cached"] = handler.last_timing.cached
+                result["stages"] = handler.last_stage_timings
+            except asyncio.TimeoutError:
+                result["error"] = f"Timed out after {self.timeout:g} seconds"
+            except Exception as e:
+                result["error"] = str(e)
+        return result
+
+    async def run(self, questions: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Answer every question; results come back in input order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._answer(record, semaphore) for record in questions))
+
+
+def main(argv: Optional[Sequence[str]] = None, app_class: Optional[Callable[..., Any]] = None) -> int:
+    """Entry point of `python main.py batch`; app_class defaults to main.App."""
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Answer a JSONL file of questions headlessly.")
+    parser.add_argument("questions", help="JSONL file with one {\"question\": ...} record per line")
+    parser.add_argument("--files", nargs="+", required=True, help="files to load and ask about")
+    parser.add_argument("--output", "-o", default="-", help="JSONL file for the answers (default: stdout)")
+    parser.add_argument("--report", help="also write the latency report to this JSON file")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="questions answered at once")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per question")
+    parser.add_argument("--no-cache", action="store_true", help="do not use or fill the response cache")
+    parser.add_argument("--no-local-queries", action="store_true", help="always answer from the table prompt")
+    parser.add_argument("--stub-llm", action="store_true", help="answer offline with a deterministic stub model")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="stub time to first token, in seconds")
+    args = parser.parse_args(argv)
+
+    if args.stub_llm:
+        llm_client.set_llm_factory(
+            lambda model, temperature: llm_client.StubChatModel(model, temperature, latency=args.stub_latency)
+        )
+
+    if app_class is None:
+        from main import App as app_class
+    app = app_class(local_queries=not args.no_local_queries, voice=False)
+    try:
+        status = app.load_files(args.files)
+        print(status, file=sys.stderr)
+        if not app.dataframes:
+            return 1
+
+        questions = read_questions(args.questions)
+        runner = BatchRunner(app, concurrency=args.concurrency, timeout=args.timeout, use_cache=not args.no_cache)
+        start = time.perf_counter()
+        results = asyncio.run(runner.run(questions))
+        report = latency_report(results, time.perf_counter() - start)
+    finally:
+        app.shutdown()
+
+    lines = "".join(json.dumps(result) + "\n" for result in results)
+    if args.output == "-":
+        print(lines, end="")
+    else:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(lines)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    return 0 if report["errors"] == 0 else 2
@@ -0,0 +1,107 @@
+"""Measure cold-start time of the application.
+
+Each measurement runs in a fresh interpreter. The "deferred" case imports main
+as it is now; the "eager" case additionally imports the dependencies that are
+now loaded on first use (LLM client, PDF/DOCX parsers, voice libraries), which
+is what start-up paid for when they were imported at module level. The "app"
+case imports main and constructs App(), which is what launching the GUI pays
+before the window appears. With --baseline, App() construction is also timed in
+that git revision of the tree, for a like-for-like comparison.
+
+    python benchmarks/startup.py --runs 5 --baseline <commit> --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules main.py no longer imports at start-up
+DEFERRED_MODULES = ["langchain_openai", "pdfplumber", "docx", "speech_recognition", "pyttsx3"]
+
+
+APP_STATEMENT = "import main\nmain.App()"
+
+
+def time_import(statement: str, runs: int, cwd: str = REPO_ROOT) -> List[float]:
+    """Wall-clock seconds for running statement in `runs` fresh interpreters started in cwd."""
+    code = (
+        "import os, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(time.perf_counter() - start)\n"
+        "sys.stdout.flush()\n"
+        "os._exit(0)\n"  # Skip joining the App's background threads
+    )
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def checkout(revision: str, directory: str) -> str:
+    """Extract the tree of a git revision into directory and return its path."""
+    archive = os.path.join(directory, "tree.tar")
+    subprocess.run(["git", "archive", "--output", archive, revision], cwd=REPO_ROOT, check=True)
+    tree = os.path.join(directory, "tree")
+    with tarfile.open(archive) as tar:
+        tar.extractall(tree)
+    return tree
+
+
+def available(module: str) -> bool:
+    result = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True)
+    return result.returncode == 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", help="Git revision whose App() construction to compare against")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    eager_modules = [module for module in DEFERRED_MODULES if available(module)]
+    cases = {
+        "deferred": "import main",
+        "eager": "\n".join(["import main"] + [f"import {module}" for module in eager_modules]),
+        "app": APP_STATEMENT,
+    }
+    results: Dict[str, Dict[str, float]] = {}
+    for name, statement in cases.items():
+        timings = time_import(statement, args.runs)
+        results[name] = {"median_s": statistics.median(timings), "min_s": min(timings), "runs": args.runs}
+
+    app_saved_s: Optional[float] = None
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            timings = time_import(APP_STATEMENT, args.runs, cwd=checkout(args.baseline, directory))
+        results["baseline_app"] = {"median_s": statistics.median(timings), "min_s": min(timings), "runs": args.runs}
+        app_saved_s = results["baseline_app"]["median_s"] - results["app"]["median_s"]
+
+    report = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "eager_modules": eager_modules,
+        "baseline": args.baseline,
+        "results": results,
+        "saved_s": results["eager"]["median_s"] - results["deferred"]["median_s"],
+        "app_saved_s": app_saved_s,  # App() construction, baseline minus current
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Benchmark file loading, Excel workbooks, comparison, prompt building and end-to-end query latency.
+
+Datasets are generated from the covid.csv schema (see synthetic.py) into a scratch
+directory, and the parse cache points at a scratch directory too, so runs do not
+depend on earlier ones. The LLM is replaced by the offline stub model. Results are
+written as JSON, tagged with the git commit, so they can be compared across commits.
+
+    python benchmarks/suite.py --rows 10000 100000 1000000 --output bench.json
+    python benchmarks/suite.py --only prompt e2e --rows 1000
+    python benchmarks/suite.py --only excel --sheets 4 24 --sheet-rows 20000
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+SUITES = ("loaders", "excel", "comparer", "prompt", "e2e")
+FORMATS = ("csv", "xlsx", "sql")
+# The loader before multi-sheet support read the first sheet through pandas' default engine
+EXCEL_CASES = ("previous_first_sheet", "previous_all_sheets", "loader", "loader_one_sheet", "loader_three_columns")
+QUESTIONS = [
+    "Which country has the most total cases?",
+    "What is the average death rate across all countries?",
+    "Summarize the data.",
+]
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Median and minimum wall-clock seconds of `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "runs": repeat}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_loaders(rows: Sequence[int], work_dir: str, repeat: int) -> List[Dict[str, Any]]:
+    """FileHandler load time per format: cold (no cache) and from the parse cache."""
+    from synthetic import MAX_ROWS, covid_like, write_dataset
+    from file_handler import FileHandler, parse_cache
+
+    results = []
+    for n in rows:
+        df = covid_like(n)
+        for file_format in FORMATS:
+            limit = MAX_ROWS[file_format]
+            if limit is not None and n > limit:
+                continue
+            path = write_dataset(df, work_dir, f"covid_{n}", file_format)
+            result = {
+                "format": file_format, "rows": n, "file_bytes": os.path.getsize(path),
+                "uncached": measure(lambda: FileHandler(path, use_cache=False).close(), repeat),
+            }
+            if parse_cache.available:
+                FileHandler(path).close()  # Fill the cache
+                result["cached"] = measure(lambda: FileHandler(path).close(), repeat)
+            results.append(result)
+            print(f"loaders: {file_format} {n} rows {result['uncached']['median_s']:.3f}s", file=sys.stderr)
+    return results
+
+
+def _excel_case(path: str, case: str, repeat: int) -> Dict[str, Any]:
+    """Time one way of reading a workbook and its peak memory growth; runs in a fresh worker process."""
+    import pandas as pd
+    from file_handler import EXCEL_ENGINE, FileHandler
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        resource = None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+
+    def load() -> None:
+        if case == "previous_first_sheet":
+            pd.read_excel(path)
+        elif case == "previous_all_sheets":
+            pd.read_excel(path, sheet_name=None)
+        elif case == "loader":
+            FileHandler(path, use_cache=False, compact=False)
+        elif case == "loader_one_sheet":
+            FileHandler(path, use_cache=False, compact=False, sheets=[0])
+        elif case == "loader_three_columns":
+            FileHandler(path, use_cache=False, compact=False, usecols=[0, 1, 2])
+
+    result: Dict[str, Any] = {"case": case, "engine": EXCEL_ENGINE or "default", "time": measure(load, repeat)}
+    if resource:
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss_growth_mb"] = (rss_after - rss_before) * rss_unit / 1024 ** 2
+    return result
+
+
+def bench_excel(sheets: Sequence[int], rows: int, work_dir: str, repeat: int) -> List[Dict[str, Any]]:
+    """Workbook load time and memory: the previous single-sheet read against the multi-sheet loader."""
+    from synthetic import write_workbook
+
+    results = []
+    for k in sheets:
+        path = write_workbook(k, rows, work_dir, f"workbook_{k}")
+        for case in EXCEL_CASES:
+            # A fresh process per case, so peak memory is not inherited from earlier cases
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(_excel_case, path, case, repeat).result()
+            result.update({"sheets": k, "rows_per_sheet": rows, "file_bytes": os.path.getsize(path)})
+            results.append(result)
+            print(f"excel: {k} sheets x {rows} rows {case} {result['time']['median_s']:.3f}s", file=sys.stderr)
+    return results
+
+
+def bench_comparer(rows: Sequence[int], files: Sequence[int], repeat: int) -> List[Dict[str, Any]]:
+    """DataComparer time for all pairs of `files` tables of each size (1% of cells changed per file)."""
+    from comparison import DataComparer
+    from synthetic import covid_like, perturb
+
+    results = []
+    for n in rows:
+        base = covid_like(n)
+        for k in files:
+            frames = [base] + [perturb(base, seed=i) for i in range(1, k)]
+
+            def compare() -> None:
+                comparer = DataComparer(frames)
+                comparer.format_summary(comparer.compare_all())
+
+            result = {"rows": n, "files": k, "pairs": k * (k - 1) // 2, "time": measure(compare, repeat)}
+            results.append(result)
+            print(f"comparer: {k} files x {n} rows {result['time']['median_s']:.3f}s", file=sys.stderr)
+    return results
+
+
+def bench_prompt(rows: Sequence[int], repeat: int) -> List[Dict[str, Any]]:
+    """QueryHandler._create_prompt size and time, for a new table and for one already profiled."""
+    from synthetic import covid_like
+    from prompt_context import count_tokens
+    from query_handler import QueryHandler
+
+    results = []
+    for n in rows:
+        df = covid_like(n)
+        handler = QueryHandler(use_cache=False)
+        start = time.perf_counter()
+        prompt = handler._create_prompt(df, QUESTIONS[0])
+        first = time.perf_counter() - start
+        results.append({
+            "rows": n,
+            "prompt_chars": len(prompt),
+            "prompt_tokens": count_tokens(prompt),
+            "first_s": first,
+            "warm": measure(lambda: handler._create_prompt(df, QUESTIONS[0]), repeat),
+        })
+        print(f"prompt: {n} rows {results[-1]['prompt_tokens']} tokens {first:.3f}s", file=sys.stderr)
+    return results
+
+
+def bench_e2e(rows: Sequence[int], work_dir: str, latency: float) -> List[Dict[str, Any]]:
+    """App load plus questions answered by the stub model, with the per-stage timings."""
+    import llm_client
+    from synthetic import covid_like, write_dataset
+    from main import App
+
+    llm_client.set_llm_factory(lambda model, temperature: llm_client.StubChatModel(model, temperature, latency=latency))
+    results = []
+    try:
+        for n in rows:
+            path = write_dataset(covid_like(n), work_dir, f"e2e_{n}", "csv")
+            app = App(voice=False)
+            app.query_handler.response_cache = None
+            start = time.perf_counter()
+            app.load_files([path])
+            load_s = time.perf_counter() - start
+            questions = []
+            for question in QUESTIONS:
+                start = time.perf_counter()
+                app.handle_query(question)
+                questions.append({"question": question, "total_s": time.perf_counter() - start,
+                                  "stages": dict(app.last_stage_timings),
+                                  "prompt_tokens": app.query_handler.last_prompt_metrics.total_tokens})
+            app.shutdown()
+            results.append({"rows": n, "stub_latency_s": latency, "load_s": load_s, "questions": questions})
+            print(f"e2e: {n} rows load {load_s:.3f}s", file=sys.stderr)
+    finally:
+        llm_client.set_llm_factory(None)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--sheets", type=int, nargs="+", default=[4, 24], help="sheets per benchmark workbook")
+    parser.add_argument("--sheet-rows", type=int, default=20_000, help="rows per benchmark workbook sheet")
+    parser.add_argument("--files", type=int, nargs="+", default=[2, 4], help="tables compared at once")
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="simulated LLM time to first token")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="ai-assistant-bench-")
+    os.environ["AI_ASSISTANT_CACHE_DIR"] = os.path.join(work_dir, "cache")  # Read when the cache is imported
+    sys.path.insert(0, BENCHMARK_DIR)
+    try:
+        results: Dict[str, Any] = {}
+        if "loaders" in args.only:
+            results["loaders"] = bench_loaders(args.rows, work_dir, args.repeat)
+        if "excel" in args.only:
+            results["excel"] = bench_excel(args.sheets, args.sheet_rows, work_dir, args.repeat)
+        if "comparer" in args.only:
+            results["comparer"] = bench_comparer(args.rows, args.files, args.repeat)
+        if "prompt" in args.only:
+            results["prompt"] = bench_prompt(args.rows, args.repeat)
+        if "e2e" in args.only:
+            results["e2e"] = bench_e2e(args.rows, work_dir, args.stub_latency)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "suite",
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "rows": args.rows,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Synthetic datasets with the schema of covid.csv, at any number of rows.
+
+Numeric columns are drawn from log-normal distributions fitted to the matching
+columns of covid.csv, so value ranges and skew resemble the real file. Generation
+is deterministic for a given seed.
+"""
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(REPO_ROOT, "covid.csv")
+
+# Largest tables written per format; Excel also has a hard limit of 1,048,576 rows
+MAX_ROWS = {"csv": None, "sql": 2_000_000, "xlsx": 200_000}
+SQL_TABLE_NAME = "mytable"
+
+
+def _schema() -> Tuple[pd.DataFrame, Dict[str, Tuple[float, float]]]:
+    """The real file and (mean, std) of log1p of each numeric column."""
+    real = pd.read_csv(SCHEMA_FILE, encoding="utf-8-sig")
+    params = {}
+    for col in real.select_dtypes(include="number").columns[1:]:  # The first column is the row number
+        logs = np.log1p(real[col].dropna().clip(lower=0).astype(float))
+        params[col] = (float(logs.mean()), float(logs.std()))
+    return real, params
+
+
+def covid_like(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A table of `rows` rows with covid.csv's columns and value distributions."""
+    real, params = _schema()
+    rng = np.random.default_rng(seed)
+    columns = real.columns
+    data = {columns[0]: np.arange(1, rows + 1)}
+    countries = real[columns[1]].astype(str).to_numpy()
+    # Real names first, then numbered variants so the name column stays unique
+    names = np.array([f"{countries[i % len(countries)]} {i // len(countries)}" for i in range(rows)], dtype=object)
+    names[:min(rows, len(countries))] = countries[:rows]
+    data[columns[1]] = names
+    for col, (mean, std) in params.items():
+        data[col] = np.round(np.expm1(rng.normal(mean, std, rows))).clip(min=0).astype(np.int64)
+    return pd.DataFrame(data, columns=columns)
+
+
+def perturb(df: pd.DataFrame, fraction: float = 0.01, seed: int = 1) -> pd.DataFrame:
+    """A copy of df with about `fraction` of its numeric cells changed and 1% of rows dropped."""
+    rng = np.random.default_rng(seed)
+    changed = df.copy()
+    numeric = changed.select_dtypes(include="number").columns[1:]
+    for col in numeric:
+        mask = rng.random(len(changed)) < fraction
+        changed.loc[mask, col] = changed.loc[mask, col] + 1
+    keep = rng.random(len(changed)) >= 0.01
+    return changed[keep].reset_index(drop=True)
+
+
+def write_dataset(df: pd.DataFrame, directory: str, name: str, file_format: str) -> str:
+    """Write df as csv, xlsx or a SQL dump (CREATE TABLE plus one INSERT per row) and return the path."""
+    path = os.path.join(directory, f"{name}.{file_format}")
+    if file_format == "csv":
+        df.to_csv(path, index=False)
+    elif file_format == "xlsx":
+        df.to_excel(path, index=False)
+    elif file_format == "sql":
+        letters = [chr(ord("A") + i) for i in range(len(df.columns))]
+        column_list = ",".join(letters)
+        with open(path, "w", encoding="utf-8") as sql_file:
+            sql_file.write(f"CREATE TABLE {SQL_TABLE_NAME}(\n")
+            sql_file.write("\n  ,".join(f"   {letter} VARCHAR(32) NOT NULL" for letter in letters))
+            sql_file.write("\n);\n")
+            prefix = f"INSERT INTO {SQL_TABLE_NAME}({column_list}) VALUES ("
+            header = ",".join("'" + str(col).replace("'", "''") + "'" for col in df.columns)
+            sql_file.write(f"{prefix}{header});\n")
+            for row in df.astype(str).itertuples(index=False):
+                values = ",".join("'" + value.replace("'", "''") + "'" for value in row)
+                sql_file.write(f"{prefix}{values});\n")
+    else:
+        raise ValueError(f"Unsupported benchmark format: {file_format}")
+    return path
+
+
+def write_workbook(sheets: int, rows: int, directory: str, name: str) -> str:
+    """Write an .xlsx workbook of `sheets` covid-like sheets of `rows` rows each and return the path."""
+    path = os.path.join(directory, f"{name}.xlsx")
+    with pd.ExcelWriter(path) as writer:
+        for sheet in range(sheets):
+            covid_like(rows, seed=sheet).to_excel(writer, sheet_name=f"Sheet {sheet + 1}", index=False)
+    return path
@@ -0,0 +1,152 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Convert text columns to category when distinct values make up at most this share of rows
+CATEGORY_MAX_RATIO = 0.5
+# Share of a column's remaining values that must be numeric for its first value to count as a header
+HEADER_NUMERIC_RATIO = 0.9
+# Placeholder column names produced by SQL dumps, spreadsheets and headerless reads
+GENERIC_COLUMN_PATTERN = re.compile(r"^([A-Z]{1,2}|Unnamed: \d+|col(umn)?_?\d+|\d+)$", re.IGNORECASE)
+
+
+@dataclass
+class CompactionReport:
+    """What compact_dataframe changed and how much memory it saved."""
+    bytes_before: int
+    bytes_after: int
+    header_promoted: bool = False
+    converted: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self) -> str:
+        lines = [
+            f"Memory: {self.bytes_before / 1024 ** 2:.2f} MB -> {self.bytes_after / 1024 ** 2:.2f} MB "
+            f"({self.bytes_saved / 1024 ** 2:.2f} MB saved)"
+        ]
+        if self.header_promoted:
+            lines.append("First data row was a header and became the column names.")
+        lines.extend(f"{col}: {old} -> {new}" for col, (old, new) in self.converted.items())
+        return "\n".join(lines)
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def has_header_row(df: pd.DataFrame) -> bool:
+    """Detect a header row that was loaded as the first data row.
+
+    The first row must be distinct, non-empty strings, and either the column names
+    are placeholders (A, B, ... or Unnamed: 0) or some column is numeric below a
+    non-numeric first value.
+    """
+    if len(df) < 2:
+        return False
+    first = df.iloc[0]
+    if first.isna().any() or not all(isinstance(value, str) and value.strip() for value in first):
+        return False
+    if first.nunique() != len(first):
+        return False
+    if all(GENERIC_COLUMN_PATTERN.match(str(col)) for col in df.columns):
+        return True
+
+    rest = df.iloc[1:]
+    for col in df.columns:
+        if pd.notna(pd.to_numeric(pd.Series([first[col]]), errors="coerce").iloc[0]):
+            continue
+        values = rest[col].dropna()
+        if len(values) and pd.to_numeric(values, errors="coerce").notna().mean() >= HEADER_NUMERIC_RATIO:
+            return True
+    return False
+
+
+def promote_header_row(df: pd.DataFrame) -> pd.DataFrame:
+    """Use the first data row as column names."""
+    promoted = df.iloc[1:].reset_index(drop=True)
+    promoted.columns = [str(value).strip() for value in df.iloc[0]]
+    return promoted
+
+
+def _prints_back(text: pd.Series, numeric: pd.Series) -> bool:
+    """True when every number, printed as an integer or as Python prints floats, equals its original text."""
+    text = text.astype(str).str.strip()
+    if pd.api.types.is_integer_dtype(numeric):
+        return bool((numeric.astype(str) == text).all())
+    floats = numeric.astype(np.float64)
+    whole = floats.map(lambda value: str(int(value)) if value.is_integer() else "")
+    return bool(((floats.map(repr) == text) | (whole == text)).all())
+
+
+def _compact_column(series: pd.Series) -> pd.Series:
+    """Return the smallest lossless representation of one column.
+
+    Integers stay int64, because arithmetic on narrower types overflows silently.
+    Numeric text is only converted when every number prints back as the original
+    text, so values such as "007" or "1e3" are kept as text.
+    """
+    if _is_text(series):
+        non_null = series.dropna()
+        if non_null.empty:
+            return series
+        numeric = pd.to_numeric(non_null, errors="coerce")
+        if numeric.notna().all() and _prints_back(non_null, numeric):
+            series = pd.to_numeric(series, errors="coerce")
+        else:
+            if non_null.nunique() <= CATEGORY_MAX_RATIO * len(series) and len(series) > 1:
+                return series.astype("category")
+            return series
+
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+        finite = values[~np.isnan(values)]
+        if finite.size == len(values) and np.array_equal(finite, np.round(finite)) and (
+            finite.size == 0 or np.abs(finite).max() < 2 ** 53
+        ):
+            return series.astype(np.int64)
+        as_float32 = values.astype(np.float32)
+        same = (as_float32.astype(np.float64) == values) | np.isnan(values)
+        if same.all():
+            return series.astype(np.float32)
+    return series
+
+
+def compact_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, CompactionReport]:
+    """Normalize a loaded DataFrame and shrink its memory footprint.
+
+    Promotes a header row that was loaded as data, turns numeric text into numbers,
+    stores whole floats as int64 and other floats as float32 where that is exact,
+    and converts low-cardinality text to category. Text documents (a single 'Content' cell)
+    are left alone.
+    """
+    bytes_before = int(df.memory_usage(deep=True).sum())
+    if df.empty or list(df.columns) == ['Content']:
+        return df, CompactionReport(bytes_before, bytes_before)
+
+    header_promoted = has_header_row(df)
+    if header_promoted:
+        df = promote_header_row(df)
+
+    converted: Dict[str, Tuple[str, str]] = {}
+    columns: List[pd.Series] = []
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        compacted = _compact_column(series)
+        if compacted.dtype != series.dtype:
+            converted[str(df.columns[position])] = (str(series.dtype), str(compacted.dtype))
+        columns.append(compacted)
+    if converted:
+        df = pd.concat(columns, axis=1)
+
+    bytes_after = int(df.memory_usage(deep=True).sum())
+    return df, CompactionReport(bytes_before, bytes_after, header_promoted, converted)
@@ -1,10 +1,234 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 import pandas as pd
-from typing import List, Union
+
+from text_diff import DEFAULT_MAX_DIFF_CHARS, TextHunk, diff_hunks, line_hashes, render_hunks
+
+# Column names that usually hold an identifier (e.g. "id", "CustomerID", "country_code").
+KEY_NAME_PATTERN = re.compile(r"(?i:(^|[\s_.\-])(id|key|code)$)|[a-z](Id|ID)$")
+
+
+@dataclass
+class TabularDiff:
+    """Key-aligned difference between two tabular DataFrames."""
+    key_columns: List[str]
+    shape1: Tuple[int, int]
+    shape2: Tuple[int, int]
+    added_columns: List[str] = field(default_factory=list)
+    removed_columns: List[str] = field(default_factory=list)
+    column_order_changed: bool = False
+    added_rows: pd.DataFrame = field(default_factory=pd.DataFrame)
+    removed_rows: pd.DataFrame = field(default_factory=pd.DataFrame)
+    changed_cells: pd.DataFrame = field(default_factory=pd.DataFrame)
+    sampled: bool = False  # True when at least one side is a row sample of a streamed table
+
+    @property
+    def identical(self) -> bool:
+        """True when both DataFrames hold the same columns and rows."""
+        return (
+            not self.added_columns
+            and not self.removed_columns
+            and self.added_rows.empty
+            and self.removed_rows.empty
+            and self.changed_cells.empty
+        )
+
+    @property
+    def changed_row_count(self) -> int:
+        """Number of matched rows with at least one changed cell."""
+        if self.changed_cells.empty:
+            return 0
+        return len(self.changed_cells.drop_duplicates(subset=self._row_label_columns))
+
+    @property
+    def _row_label_columns(self) -> List[str]:
+        return self.key_columns or ["Row"]
+
+    def summary_lines(self, max_rows: int = 20) -> List[str]:
+        """Render the difference as compact text, previewing at most max_rows per section."""
+        if self.identical:
+            lines = ["No differences in tabular content."]
+            if self.column_order_changed:
+                lines.append("Column order differs.")
+            return lines
+
+        lines = ["Differences found in tabular content."]
+        if self.sampled:
+            lines.append("Compared on row samples; at least one table was streamed and not fully loaded.")
+        if self.key_columns:
+            lines.append(f"Rows matched on key: {', '.join(map(str, self.key_columns))}")
+        else:
+            lines.append("Rows matched by position (no unique key column found).")
+        if self.shape1 != self.shape2:
+            lines.append(f"Shape: {self.shape1} vs {self.shape2}")
+        if self.removed_columns:
+            lines.append(f"Columns only in File 1: {self.removed_columns}")
+        if self.added_columns:
+            lines.append(f"Columns only in File 2: {self.added_columns}")
+        if self.column_order_changed:
+            lines.append("Column order differs.")
+
+        sections = [
+            ("Rows only in File 1", self.removed_rows),
+            ("Rows only in File 2", self.added_rows),
+        ]
+        for title, rows in sections:
+            if not rows.empty:
+                lines.append(f"{title}: {len(rows)}")
+                lines.append(self._preview(rows, max_rows))
+
+        if not self.changed_cells.empty:
+            lines.append(
+                f"Changed cells: {len(self.changed_cells)} across {self.changed_row_count} rows"
+            )
+            lines.append(self._preview(self.changed_cells, max_rows))
+        return lines
+
+    @staticmethod
+    def _preview(df: pd.DataFrame, max_rows: int) -> str:
+        """Format the first max_rows rows of df, noting how many were left out."""
+        preview = df.head(max_rows).to_string(index=False)
+        if len(df) > max_rows:
+            preview += f"\n... ({len(df) - max_rows} more)"
+        return preview
+
+
+@dataclass
+class TextDiff:
+    """Line-level difference between the text content of two documents.
+
+    Only the changed hunks are kept, with a few lines of context; lines are compared
+    with whitespace normalized, so re-wrapped spacing alone is not a change.
+    """
+    lines1: List[str] = field(default_factory=list)
+    lines2: List[str] = field(default_factory=list)
+    hunks: List[TextHunk] = field(default_factory=list)
+    max_chars: int = DEFAULT_MAX_DIFF_CHARS
+
+    @classmethod
+    def from_texts(cls, text1: str, text2: str, max_chars: int = DEFAULT_MAX_DIFF_CHARS) -> "TextDiff":
+        lines1, hashes1 = line_hashes(text1)
+        lines2, hashes2 = line_hashes(text2)
+        return cls(lines1, lines2, diff_hunks(hashes1, hashes2), max_chars)
+
+    @property
+    def identical(self) -> bool:
+        return not self.hunks
+
+    def summary_lines(self, max_rows: int = 20) -> List[str]:
+        if self.identical:
+            return ["No differences in text content."]
+        removed = sum(i2 - i1 for hunk in self.hunks for _, i1, i2, _, _ in hunk.changes)
+        added = sum(j2 - j1 for hunk in self.hunks for _, _, _, j1, j2 in hunk.changes)
+        return [
+            f"Differences found in text content: {len(self.hunks)} changed section(s), "
+            f"{removed} line(s) removed and {added} added (File 1: {len(self.lines1)} lines, "
+            f"File 2: {len(self.lines2)} lines).",
+            *render_hunks(self.hunks, self.lines1, self.lines2, self.max_chars),
+        ]
+
+
+PairDiff = Union[TabularDiff, TextDiff]
+
+
+@dataclass
+class DataFrameFingerprint:
+    """Per-row and per-column content hashes of a DataFrame, computed once per file.
+
+    row_hashes is None for tables that were streamed rather than held in memory.
+    """
+    columns: Tuple[str, ...]
+    row_hashes: Optional[np.ndarray]
+    column_hashes: Dict[str, str]
+    digest: str
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "DataFrameFingerprint":
+        """Hash every column with pd.util.hash_pandas_object and fold the results into row hashes."""
+        builder = FingerprintBuilder()
+        builder.update(df)
+        return builder.build()
+
+    def identical_columns(self, other: "DataFrameFingerprint") -> List[str]:
+        """Columns whose values are identical, position for position, in both frames."""
+        return [
+            col for col, digest in self.column_hashes.items()
+            if other.column_hashes.get(col) == digest
+        ]
+
+
+class FingerprintBuilder:
+    """Builds a DataFrameFingerprint chunk by chunk, so large tables can be hashed while streaming.
+
+    Feeding a table in chunks yields the same digests as hashing it in one piece.
+    """
+    def __init__(self, keep_row_hashes: bool = True):
+        self.keep_row_hashes: bool = keep_row_hashes
+        self.columns: Optional[Tuple[str, ...]] = None
+        self._row_hash_parts: List[np.ndarray] = []
+        self._column_hashes: Dict[str, Any] = {}
+        self._frame_hash = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Hash the next chunk of rows."""
+        if self.columns is None:
+            self.columns = tuple(chunk.columns)
+            self._column_hashes = {col: hashlib.blake2b(digest_size=16) for col in self.columns}
+            self._frame_hash = hashlib.blake2b(repr(self.columns).encode(), digest_size=16)
+
+        row_hashes = np.zeros(len(chunk), dtype=np.uint64)
+        for col in self.columns:
+            hashes = pd.util.hash_pandas_object(chunk[col], index=False).to_numpy()
+            self._column_hashes[col].update(hashes.tobytes())
+            row_hashes = (row_hashes * np.uint64(1000003)) ^ hashes
+        self._frame_hash.update(row_hashes.tobytes())
+        if self.keep_row_hashes:
+            self._row_hash_parts.append(row_hashes)
+
+    def build(self) -> DataFrameFingerprint:
+        """Return the fingerprint of everything hashed so far."""
+        if self.columns is None:
+            self.update(pd.DataFrame())
+        row_hashes = None
+        if self.keep_row_hashes:
+            row_hashes = (
+                np.concatenate(self._row_hash_parts) if self._row_hash_parts
+                else np.zeros(0, dtype=np.uint64)
+            )
+        column_hashes = {col: h.hexdigest() for col, h in self._column_hashes.items()}
+        return DataFrameFingerprint(self.columns, row_hashes, column_hashes, self._frame_hash.hexdigest())
+
 
 class DataComparer:
-    def __init__(self, dataframes: List[pd.DataFrame]):
-        """Initialize the DataComparer with a list of DataFrames."""
+    def __init__(
+        self,
+        dataframes: List[pd.DataFrame],
+        key_columns: Optional[Sequence[str]] = None,
+        labels: Optional[Sequence[str]] = None,
+        max_rows: int = 20,
+        fingerprints: Optional[Sequence[Optional[DataFrameFingerprint]]] = None,
+    ):
+        """Initialize the DataComparer with a list of DataFrames.
+
+        key_columns pins the columns rows are aligned on; when omitted a unique
+        column shared by both frames is inferred per pair. labels name the frames
+        in the summary (defaults to "DataFrame 1", "DataFrame 2", ...).
+        fingerprints carries previously computed DataFrameFingerprints (None for
+        frames not hashed yet) so callers can cache them per file.
+        """
         self.dataframes: List[pd.DataFrame] = dataframes
+        self.key_columns: Optional[List[str]] = list(key_columns) if key_columns else None
+        self.labels: List[str] = list(labels) if labels else [
+            f"DataFrame {i + 1}" for i in range(len(dataframes))
+        ]
+        self.max_rows: int = max_rows
+        self.fingerprints: List[Optional[DataFrameFingerprint]] = (
+            list(fingerprints) if fingerprints else [None] * len(dataframes)
+        )
 
     def process_dataframes(self) -> Union[pd.DataFrame, str]:
         """Process the DataFrames and return a summary of their differences."""
@@ -12,24 +236,51 @@ class DataComparer:
             return self.dataframes[0]
         elif len(self.dataframes) < 2:
             raise ValueError("At least two DataFrames are required for comparison.")
-        
-        return self._compare_multiple_dataframes()
 
-    def _compare_multiple_dataframes(self) -> str:
-        """Compare multiple DataFrames and return a summary of their differences."""
-        comparison_results: List[str] = []
+        return self._compare_multiple_dataframes()
 
+    def compare_all(self) -> Dict[Tuple[int, int], PairDiff]:
+        """Compare every pair of DataFrames and return the structured results keyed by index pair."""
+        results: Dict[Tuple[int, int], PairDiff] = {}
+        by_digest: Dict[Tuple[str, str], PairDiff] = {}
         num_dfs = len(self.dataframes)
         for i in range(num_dfs):
             for j in range(i + 1, num_dfs):
-                df1 = self.dataframes[i]
-                df2 = self.dataframes[j]
-                comparison_results.append(f"Comparing DataFrame {i + 1} with DataFrame {j + 1}:")
-                comparison_results.append(self._compare_two_dataframes(df1, df2))
-                comparison_results.append("\n")  # Add a newline between comparisons
+                fp1, fp2 = self.fingerprint(i), self.fingerprint(j)
+                # Pairs with the same content as an already compared pair reuse its result
+                digest_pair = (fp1.digest, fp2.digest)
+                if digest_pair not in by_digest:
+                    by_digest[digest_pair] = self.compare_pair(
+                        self.dataframes[i], self.dataframes[j], fp1, fp2
+                    )
+                results[(i, j)] = by_digest[digest_pair]
+        return results
+
+    def fingerprint(self, index: int) -> DataFrameFingerprint:
+        """Return the fingerprint of the DataFrame at index, computing it on first use."""
+        if self.fingerprints[index] is None:
+            self.fingerprints[index] = DataFrameFingerprint.from_dataframe(self.dataframes[index])
+        return self.fingerprints[index]
 
+    def format_summary(self, results: Dict[Tuple[int, int], PairDiff]) -> str:
+        """Build the comparison summary text from structured pair results."""
+        comparison_results: List[str] = []
+        for (i, j), diff in results.items():
+            comparison_results.extend(self.format_pair(self.labels[i], self.labels[j], diff))
         return "\n".join(comparison_results)
 
+    def format_pair(self, label1: str, label2: str, diff: PairDiff) -> List[str]:
+        """Summary lines for one compared pair."""
+        return [
+            f"Comparing {label1} with {label2}:",
+            "\n".join(diff.summary_lines(self.max_rows)),
+            "\n",  # Add a newline between comparisons
+        ]
+
+    def _compare_multiple_dataframes(self) -> str:
+        """Compare multiple DataFrames and return a summary of their differences."""
+        return self.format_summary(self.compare_all())
+
     def process_single_dataframe(self, df: pd.DataFrame) -> str:
         """Generate a summary for a single DataFrame."""
         if 'Content' in df.columns:
@@ -42,46 +293,261 @@ class DataComparer:
             ]
             return "\n".join(summary)
 
+    def compare_pair(
+        self,
+        df1: pd.DataFrame,
+        df2: pd.DataFrame,
+        fp1: Optional[DataFrameFingerprint] = None,
+        fp2: Optional[DataFrameFingerprint] = None,
+    ) -> PairDiff:
+        """Compare two DataFrames and return the structured difference.
+
+        When fingerprints are given, identical frames short-circuit and only the
+        rows or columns whose hashes differ go through the detailed diff.
+        """
+        is_text = 'Content' in df1.columns and 'Content' in df2.columns
+        if fp1 is not None and fp2 is not None and fp1.digest == fp2.digest:
+            if is_text:
+                return TextDiff()
+            return TabularDiff(key_columns=[], shape1=df1.shape, shape2=df2.shape)
+        if is_text:
+            return self._compare_text_content(df1, df2)
+        return self._compare_tabular_content(df1, df2, fp1, fp2)
+
     def _compare_two_dataframes(self, df1: pd.DataFrame, df2: pd.DataFrame) -> str:
         """Compare two DataFrames and return a summary of their differences."""
-        comparison_results: List[str] = []
+        return "\n".join(self.compare_pair(df1, df2).summary_lines(self.max_rows))
 
-        if 'Content' in df1.columns and 'Content' in df2.columns:
-            comparison_results.extend(self._compare_text_content(df1, df2))
+    def _compare_text_content(self, df1: pd.DataFrame, df2: pd.DataFrame) -> TextDiff:
+        """Compare text content of two DataFrames line by line."""
+        return TextDiff.from_texts(str(df1['Content'].iloc[0]), str(df2['Content'].iloc[0]))
+
+    def _compare_tabular_content(
+        self,
+        df1: pd.DataFrame,
+        df2: pd.DataFrame,
+        fp1: Optional[DataFrameFingerprint] = None,
+        fp2: Optional[DataFrameFingerprint] = None,
+    ) -> TabularDiff:
+        """Compare tabular content of two DataFrames, aligning rows on a key."""
+        if self.key_columns:
+            missing = [c for c in self.key_columns if c not in df1.columns or c not in df2.columns]
+            if missing:
+                raise ValueError(f"Key columns {missing} are not present in both DataFrames.")
+            for df in (df1, df2):
+                if df.duplicated(subset=self.key_columns).any():
+                    raise ValueError(f"Key columns {self.key_columns} do not uniquely identify rows.")
+            key_columns = self.key_columns
         else:
-            comparison_results.extend(self._compare_tabular_content(df1, df2))
+            key_columns = self.infer_key_columns(df1, df2)
+
+        if fp1 is None or fp2 is None:
+            return diff_tabular(df1, df2, key_columns)
+
+        if fp1.row_hashes is None or fp2.row_hashes is None:
+            # A streamed table is only held as a row sample, so diff the samples
+            diff = diff_tabular(df1, df2, key_columns)
+            diff.sampled = True
+            return diff
+
+        if key_columns and fp1.columns == fp2.columns:
+            # A row whose hash also occurs in the other frame is unchanged there
+            keep1 = ~np.isin(fp1.row_hashes, fp2.row_hashes)
+            keep2 = ~np.isin(fp2.row_hashes, fp1.row_hashes)
+            diff = diff_tabular(df1[keep1], df2[keep2], key_columns)
+            diff.shape1, diff.shape2 = df1.shape, df2.shape
+            return diff
+
+        skip_columns: List[str] = []
+        same_row_order = all(fp1.column_hashes.get(c) == fp2.column_hashes.get(c) for c in key_columns)
+        if len(df1) == len(df2) and same_row_order:
+            skip_columns = fp1.identical_columns(fp2)
+        return diff_tabular(df1, df2, key_columns, skip_columns)
+
+    @staticmethod
+    def infer_key_columns(df1: pd.DataFrame, df2: pd.DataFrame) -> List[str]:
+        """Pick a shared column that uniquely identifies rows in both DataFrames.
+
+        Identifier-like names win, then text columns (natural keys such as names),
+        then integer columns. Returns an empty list when nothing qualifies, which
+        means rows are aligned by position.
+        """
+        candidates = []
+        for col in df1.columns:
+            if col not in df2.columns:
+                continue
+            s1, s2 = df1[col], df2[col]
+            if pd.api.types.is_float_dtype(s1) or pd.api.types.is_float_dtype(s2):
+                continue
+            if s1.isna().any() or s2.isna().any() or not s1.is_unique or not s2.is_unique:
+                continue
+            if KEY_NAME_PATTERN.search(str(col).strip()):
+                rank = 0
+            elif pd.api.types.is_integer_dtype(s1) and pd.api.types.is_integer_dtype(s2):
+                rank = 2
+            else:
+                rank = 1
+            candidates.append((rank, len(candidates), col))
+        return [min(candidates)[2]] if candidates else []
+
+
+class ComparisonGraph:
+    """Pairwise comparison results kept up to date as files are added and removed.
 
+    Nodes are keyed by file identity (the path). Adding a file compares it only
+    against the files already present, removing one drops only its pairs, and the
+    summary text is rebuilt from the cached pair results.
+    Nodes may also carry groups and a source: only nodes sharing a group from
+    different sources are paired, so tables of one file are never compared with
+    each other. Files put their primary frame in the default group "", so every
+    two files are compared, and a table can join a named group to also be compared
+    with the same-named table of other files.
+    """
+    def __init__(self, key_columns: Optional[Sequence[str]] = None, max_rows: int = 20):
+        self.comparer = DataComparer([], key_columns=key_columns, max_rows=max_rows)
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self.fingerprints: Dict[str, DataFrameFingerprint] = {}
+        self.groups: Dict[str, Tuple[FrozenSet[str], str]] = {}  # Node id -> (groups, source)
+        self.pairs: Dict[Tuple[str, str], PairDiff] = {}
+        self._by_digest: Dict[Tuple[str, str], PairDiff] = {}
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def add(self, file_id: str, df: pd.DataFrame, fingerprint: Optional[DataFrameFingerprint] = None,
+            groups: Iterable[str] = ("",), source: Optional[str] = None) -> None:
+        """Add or replace a file and compare it against the nodes sharing one of its groups.
+
+        fingerprint is hashed from df when not given (streamed tables pass the one
+        computed while reading them). source defaults to file_id.
+        """
+        self._drop_pairs(file_id)
+        self.frames[file_id] = df  # A reloaded file keeps its position
+        self.fingerprints[file_id] = fingerprint or DataFrameFingerprint.from_dataframe(df)
+        groups = frozenset(groups)
+        source = source or file_id
+        self.groups[file_id] = (groups, source)
+        ids = list(self.frames)
+        position = ids.index(file_id)
+        for index, other_id in enumerate(ids):
+            other_groups, other_source = self.groups[other_id]
+            if other_id != file_id and groups & other_groups and other_source != source:
+                pair = (other_id, file_id) if index < position else (file_id, other_id)
+                self.pairs[pair] = self._compare(*pair)
+
+    def remove(self, file_id: str) -> None:
+        """Remove a file and the pairs it takes part in."""
+        self._drop_pairs(file_id)
+        self.frames.pop(file_id, None)
+        self.fingerprints.pop(file_id, None)
+        self.groups.pop(file_id, None)
+        digests = {fp.digest for fp in self.fingerprints.values()}
+        self._by_digest = {
+            pair: diff for pair, diff in self._by_digest.items()
+            if pair[0] in digests and pair[1] in digests
+        }
+
+    def set_key_columns(self, key_columns: Optional[Sequence[str]]) -> None:
+        """Change the row alignment key and recompute every pair."""
+        self.comparer.key_columns = list(key_columns) if key_columns else None
+        self._by_digest.clear()
+        for pair in list(self.pairs):
+            self.pairs[pair] = self._compare(*pair)
+
+    def summary(self, label: Callable[[str], str] = str) -> str:
+        """Build the comparison summary text from the cached pair results."""
+        ids = list(self.frames)
+        comparison_results: List[str] = []
+        for i in range(len(ids)):
+            for j in range(i + 1, len(ids)):
+                diff = self.pairs.get((ids[i], ids[j]))
+                if diff is None:  # Not paired: same file or no shared group
+                    continue
+                comparison_results.extend(self.comparer.format_pair(label(ids[i]), label(ids[j]), diff))
         return "\n".join(comparison_results)
 
-    def _compare_text_content(self, df1: pd.DataFrame, df2: pd.DataFrame) -> List[str]:
-        """Compare text content of two DataFrames."""
-        text1 = df1['Content'].iloc[0]
-        text2 = df2['Content'].iloc[0]
+    def _compare(self, id1: str, id2: str) -> PairDiff:
+        """Compare two files, reusing the result of a pair with the same content."""
+        fp1, fp2 = self.fingerprints[id1], self.fingerprints[id2]
+        digest_pair = (fp1.digest, fp2.digest)
+        if digest_pair not in self._by_digest:
+            self._by_digest[digest_pair] = self.comparer.compare_pair(
+                self.frames[id1], self.frames[id2], fp1, fp2
+            )
+        return self._by_digest[digest_pair]
 
-        if text1 == text2:
-            return ["No differences in text content."]
-        else:
-            return [
-                "Differences found in text content.",
-                f"File 1 Content:\n{text1}",
-                f"File 2 Content:\n{text2}"
-            ]
+    def _drop_pairs(self, file_id: str) -> None:
+        self.pairs = {pair: diff for pair, diff in self.pairs.items() if file_id not in pair}
 
-    def _compare_tabular_content(self, df1: pd.DataFrame, df2: pd.DataFrame) -> List[str]:
-        """Compare tabular content of two DataFrames."""
-        df1_text = self._convert_dataframe_to_text(df1)
-        df2_text = self._convert_dataframe_to_text(df2)
 
-        if df1_text == df2_text:
-            return ["No differences in tabular content."]
-        else:
-            return [
-                "Differences found in tabular content.",
-                f"File 1 Tabular Content:\n{df1_text}",
-                f"File 2 Tabular Content:\n{df2_text}"
-            ]
+def _values_differ(v1: np.ndarray, v2: np.ndarray) -> np.ndarray:
+    """Elementwise inequality of two aligned arrays, treating two missing values as equal."""
+    both_missing = pd.isna(v1) & pd.isna(v2)
+    try:
+        differ = np.asarray(v1 != v2, dtype=bool)
+    except (TypeError, ValueError):
+        differ = np.array([a != b for a, b in zip(v1, v2)], dtype=bool)
+    return differ & ~both_missing
 
-    @staticmethod
-    def _convert_dataframe_to_text(df: pd.DataFrame) -> str:
-        """Convert a DataFrame to a text representation."""
-        return df.to_csv(index=False) if not df.empty else ""
\ No newline at end of file
+
+def diff_tabular(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    key_columns: Sequence[str],
+    skip_columns: Sequence[str] = (),
+) -> TabularDiff:
+    """Compute added, removed and changed rows between df1 and df2 with vectorized operations.
+
+    Rows are aligned on key_columns, which must be unique in both frames, or by
+    position when key_columns is empty. skip_columns are known to be equal and
+    are left out of the cell comparison.
+    """
+    key_columns = list(key_columns)
+    common = [c for c in df1.columns if c in df2.columns]
+    common_in_df2_order = [c for c in df2.columns if c in df1.columns]
+    diff = TabularDiff(
+        key_columns=key_columns,
+        shape1=df1.shape,
+        shape2=df2.shape,
+        added_columns=[c for c in df2.columns if c not in df1.columns],
+        removed_columns=[c for c in df1.columns if c not in df2.columns],
+        column_order_changed=common != common_in_df2_order,
+    )
+
+    if key_columns:
+        left = df1.set_index(key_columns)
+        right = df2.set_index(key_columns)
+    else:
+        left = df1.reset_index(drop=True).rename_axis("Row")
+        right = df2.reset_index(drop=True).rename_axis("Row")
+
+    in_right = left.index.isin(right.index)
+    in_left = right.index.isin(left.index)
+    diff.removed_rows = left[~in_right].reset_index()
+    diff.added_rows = right[~in_left].reset_index()
+
+    shared = left.index[in_right]
+    value_columns = [c for c in common if c not in key_columns and c not in skip_columns]
+    if len(shared) == 0 or not value_columns:
+        return diff
+
+    a = left.loc[in_right, value_columns]
+    b = right.reindex(shared)[value_columns]
+    parts = []
+    for position, col in enumerate(value_columns):
+        v1 = a[col].to_numpy(dtype=object) if a[col].dtype != b[col].dtype else a[col].to_numpy()
+        v2 = b[col].to_numpy(dtype=object) if a[col].dtype != b[col].dtype else b[col].to_numpy()
+        changed = np.flatnonzero(_values_differ(v1, v2))
+        if changed.size:
+            parts.append(pd.DataFrame({
+                "_row": changed,
+                "_col": position,
+                "Column": col,
+                "File 1": pd.Series(v1[changed], dtype=object).to_numpy(),
+                "File 2": pd.Series(v2[changed], dtype=object).to_numpy(),
+            }, index=shared[changed]))
+
+    if parts:
+        cells = pd.concat(parts).sort_values(["_row", "_col"], kind="stable")
+        diff.changed_cells = cells.drop(columns=["_row", "_col"]).reset_index()
+    return diff
@@ -0,0 +1,158 @@
+import asyncio
+from typing import Callable, List, NamedTuple, Optional
+
+from llm_client import get_llm
+from prompt_context import count_tokens
+from response_cache import content_hash, normalize_question
+
+DEFAULT_HISTORY_BUDGET = 1500  # Tokens of summary plus verbatim turns sent with each prompt
+MAX_TURNS = 10
+
+SUMMARY_PROMPT = """Update the running summary of a conversation about data files.
+Keep every number, column name, file name and conclusion that later questions may refer to.
+Reply with the new summary only, in at most {max_tokens} tokens.
+
+Current summary:
+{summary}
+
+Turns to fold into the summary:
+{turns}"""
+
+
+class Turn(NamedTuple):
+    """One question and its answer, with the hash of the content it was asked against."""
+    question: str
+    answer: str
+    content_key: str
+    tokens: int
+
+    @property
+    def text(self) -> str:
+        return f"Question: {self.question}\n\nAnswer: {self.answer}\n"
+
+
+class PromptMetrics(NamedTuple):
+    """Token counts of the parts of one prompt."""
+    history_tokens: int
+    content_tokens: int
+    question_tokens: int
+
+    @property
+    def total_tokens(self) -> int:
+        return self.history_tokens + self.content_tokens + self.question_tokens
+
+
+class ConversationMemory:
+    """Conversation history that stays within a token budget.
+
+    Recent turns are kept verbatim. Once the summary plus the verbatim turns exceed
+    token_budget, the oldest turns (all but keep_recent) are folded into a running
+    summary by the LLM. Asking the same question about the same content again
+    replaces the earlier turn instead of adding a duplicate.
+    """
+    def __init__(self, token_budget: int = DEFAULT_HISTORY_BUDGET, model: str = "gpt-4o", keep_recent: int = 2,
+                 summarize: Optional[Callable[[str, List[Turn], int], str]] = None):
+        self.token_budget: int = token_budget
+        self.model: str = model
+        self.keep_recent: int = keep_recent
+        self.summarize: Callable[[str, List[Turn], int], str] = summarize or self._summarize_with_llm
+        self.turns: List[Turn] = []
+        self.summary: str = ""
+        self.summary_tokens: int = 0
+
+    @property
+    def tokens(self) -> int:
+        """Tokens the history currently adds to a prompt."""
+        return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    def add(self, question: str, answer: str, content: str) -> None:
+        """Record a finished turn, compressing older turns if the budget is exceeded."""
+        if self._record(question, answer, content):
+            self._compress()
+
+    async def aadd(self, question: str, answer: str, content: str) -> None:
+        """Async counterpart of add; cancelling it abandons the summary call and keeps the turns verbatim."""
+        if self._record(question, answer, content):
+            await self._acompress()
+
+    def _record(self, question: str, answer: str, content: str) -> bool:
+        """Add the turn, replacing an earlier identical one; True if the history now needs compressing."""
+        key = content_hash(content)
+        normalized = normalize_question(question)
+        self.turns = [
+            turn for turn in self.turns
+            if not (turn.content_key == key and normalize_question(turn.question) == normalized)
+        ]
+        turn = Turn(question, answer, key, 0)
+        self.turns.append(turn._replace(tokens=count_tokens(turn.text, self.model)))
+        return self.tokens > self.token_budget or len(self.turns) > MAX_TURNS
+
+    def render(self) -> str:
+        """The history text that precedes the content block of a prompt."""
+        parts = [turn.text for turn in self.turns]
+        if self.summary:
+            parts.insert(0, f"Summary of the earlier conversation:\n{self.summary}\n")
+        return "\n\n".join(parts)
+
+    def clear(self) -> None:
+        self.turns = []
+        self.summary = ""
+        self.summary_tokens = 0
+
+    def _compress(self) -> None:
+        """Fold the oldest turns into the summary until the history fits the budget."""
+        summary_budget = self.token_budget // 3
+        folded = self._fold(summary_budget)
+        if not folded:
+            return
+        try:
+            self.summary = self.summarize(self.summary, folded, summary_budget).strip()
+        except Exception as e:
+            # Losing the oldest turns is better than failing the request
+            print(f"Could not summarize the conversation history: {str(e)}")
+        self.summary_tokens = count_tokens(self.summary, self.model) if self.summary else 0
+
+    async def _acompress(self) -> None:
+        """Async counterpart of _compress; the default summarizer's LLM call is cancellable."""
+        summary_budget = self.token_budget // 3
+        folded = self._fold(summary_budget)
+        if not folded:
+            return
+        try:
+            if self.summarize == self._summarize_with_llm:
+                summary = await self._asummarize_with_llm(self.summary, folded, summary_budget)
+            else:
+                summary = await asyncio.to_thread(self.summarize, self.summary, folded, summary_budget)
+            self.summary = summary.strip()
+        except asyncio.CancelledError:
+            self.turns[:0] = folded  # Folded again by the next compression
+            raise
+        except Exception as e:
+            print(f"Could not summarize the conversation history: {str(e)}")
+        self.summary_tokens = count_tokens(self.summary, self.model) if self.summary else 0
+
+    def _fold(self, summary_budget: int) -> List[Turn]:
+        """Remove and return the oldest turns that no longer fit beside a summary of summary_budget tokens."""
+        folded: List[Turn] = []
+        while len(self.turns) > self.keep_recent and (
+            sum(turn.tokens for turn in self.turns) > self.token_budget - summary_budget
+            or len(self.turns) > MAX_TURNS
+        ):
+            folded.append(self.turns.pop(0))
+        return folded
+
+    def _summarize_with_llm(self, summary: str, turns: List[Turn], max_tokens: int) -> str:
+        prompt = self._summary_prompt(summary, turns, max_tokens)
+        return get_llm(model=self.model, temperature=0.0).invoke(prompt).content
+
+    async def _asummarize_with_llm(self, summary: str, turns: List[Turn], max_tokens: int) -> str:
+        prompt = self._summary_prompt(summary, turns, max_tokens)
+        return (await get_llm(model=self.model, temperature=0.0).ainvoke(prompt)).content
+
+    @staticmethod
+    def _summary_prompt(summary: str, turns: List[Turn], max_tokens: int) -> str:
+        return SUMMARY_PROMPT.format(
+            max_tokens=max_tokens,
+            summary=summary or "(none)",
+            turns="\n\n".join(turn.text for turn in turns),
+        )
@@ -0,0 +1,63 @@
+import atexit
+import os
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+
+# Pool settings for server databases (Postgres, MySQL, ...); overridable per call
+POOL_SIZE = int(os.environ.get("AI_ASSISTANT_DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(os.environ.get("AI_ASSISTANT_DB_MAX_OVERFLOW", 10))
+POOL_RECYCLE_SECONDS = 1800
+
+_engines: Dict[str, Engine] = {}
+_lock = threading.Lock()
+
+
+def is_private_database(connection_string: str) -> bool:
+    """True for in-memory SQLite URLs, where every engine is its own database and must not be shared."""
+    url = make_url(connection_string)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def get_engine(connection_string: str, pool_size: Optional[int] = None, max_overflow: Optional[int] = None) -> Engine:
+    """Return the process-wide engine for connection_string, creating it on first use.
+
+    Connections are checked with a ping before use so stale pooled connections are
+    replaced transparently. Pool size and overflow only apply when the engine is
+    first created.
+    """
+    with _lock:
+        engine = _engines.get(connection_string)
+        if engine is None:
+            options = {"pool_pre_ping": True}
+            if make_url(connection_string).get_backend_name() != "sqlite":
+                options.update(
+                    pool_size=POOL_SIZE if pool_size is None else pool_size,
+                    max_overflow=MAX_OVERFLOW if max_overflow is None else max_overflow,
+                    pool_recycle=POOL_RECYCLE_SECONDS,
+                )
+            engine = create_engine(connection_string, **options)
+            _engines[connection_string] = engine
+        return engine
+
+
+def dispose_engine(connection_string: str) -> None:
+    """Close the pooled connections of one engine and forget it."""
+    with _lock:
+        engine = _engines.pop(connection_string, None)
+    if engine is not None:
+        engine.dispose()
+
+
+def dispose_all() -> None:
+    """Close every pooled connection; called on application shutdown."""
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+atexit.register(dispose_all)
@@ -1,35 +1,109 @@
 import pandas as pd
-from docx import Document as DocxDocument
-import pdfplumber
 from sqlalchemy import create_engine, text
 import sqlalchemy
 from sqlalchemy.exc import SQLAlchemyError
-from langchain_openai import ChatOpenAI
-from typing import Optional, Union
+from sqlalchemy.pool import StaticPool
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+from concurrent.futures import ProcessPoolExecutor
+import importlib.util
 import os
+from compaction import CompactionReport, compact_dataframe
+from engine_registry import get_engine, is_private_database
+from llm_client import get_llm
+from parse_cache import ParseCache
+from pdf_extraction import extract_pdf, tables_to_frames
+from sql_script import execute_sql_script, quote_identifier, split_sql_statements
+from table_profile import TableProfile, get_profile
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# Shared by every FileHandler in the process
+parse_cache = ParseCache()
+
+# CSV files larger than this are streamed in chunks instead of loaded whole
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("AI_ASSISTANT_STREAMING_THRESHOLD", 512 * 1024 ** 2))
+DEFAULT_CHUNKSIZE = 100_000
+# calamine (python-calamine) parses workbooks far faster than openpyxl; used when installed.
+# Otherwise pandas picks its default reader: openpyxl in read-only mode for .xlsx, xlrd for .xls.
+EXCEL_ENGINE: Optional[str] = "calamine" if importlib.util.find_spec("python_calamine") else None
+
+SheetSelection = Sequence[Union[str, int]]
+ColumnSelection = Union[str, Sequence[Union[str, int]], Callable[[str], bool]]
 
 class FileHandler:
-    def __init__(self, file_path: Optional[str] = None, connection_string: Optional[str] = None):
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        connection_string: Optional[str] = None,
+        use_cache: bool = True,
+        chunksize: Optional[int] = None,
+        compact: bool = True,
+        workers: Optional[int] = None,
+        sheets: Optional[SheetSelection] = None,
+        usecols: Optional[ColumnSelection] = None,
+    ):
+        """chunksize streams CSV files and SQL query results in chunks of that many rows.
+
+        Streamed tables are never held in memory whole: df is a row sample carrying a
+        TableProfile (statistics, top values and content hashes) in df.attrs. CSV files
+        above STREAMING_THRESHOLD_BYTES are streamed even without a chunksize.
+        compact normalizes loaded files (header row detection, numeric downcasting,
+        categories); the outcome per frame is kept in compaction_reports.
+        workers sets the processes used to extract PDF pages (None = one per CPU,
+        1 = in-process).
+        sheets selects Excel sheets by name or position (None = every sheet) and usecols
+        the Excel columns to keep, in any form pd.read_excel accepts. A list of names or
+        positions is applied per sheet: each sheet keeps those of the columns it has.
+        """
         self.file_path: Optional[str] = file_path
         self.connection_string: Optional[str] = connection_string
+        self.use_cache: bool = use_cache
+        self.chunksize: Optional[int] = chunksize
+        self.compact: bool = compact
+        self.workers: Optional[int] = workers
+        self.sheets: Optional[SheetSelection] = sheets
+        self.usecols: Optional[ColumnSelection] = usecols
+        self.compaction_reports: Dict[str, CompactionReport] = {}
         self.engine = self._create_engine()
         self.df: pd.DataFrame = pd.DataFrame()
-        self.llm: Optional[ChatOpenAI] = self._initialize_llm()
+        self.frames: Dict[str, pd.DataFrame] = {}  # Every table in the file; df is the first one
+        self.error: Optional[str] = None  # Why the file could not be read; loaders then return empty frames
 
         if file_path:
             self.df = self.load_file()
 
     def _create_engine(self) -> Optional[Union[sqlalchemy.engine.base.Engine, sqlalchemy.engine.base.Connection]]:
-        """Create an appropriate database engine based on the input."""
+        """Create an appropriate database engine based on the input.
+
+        Server databases share a pooled engine per connection string from the engine
+        registry; in-memory SQLite databases get a private engine, released by close().
+        """
         if not self.connection_string and self.file_path and self.file_path.endswith('.sql'):
-            return create_engine('sqlite:///:memory:')
+            return self._create_private_engine('sqlite:///:memory:')
         elif self.connection_string:
-            return create_engine(self.connection_string)
+            if is_private_database(self.connection_string):
+                return self._create_private_engine(self.connection_string)
+            return get_engine(self.connection_string)
         return None
 
-    def _initialize_llm(self) -> Optional[ChatOpenAI]:
-        """Initialize the language model if an engine is available."""
-        return ChatOpenAI(model="gpt-4o", temperature=0.1) if self.engine else None
+    @staticmethod
+    def _create_private_engine(connection_string: str) -> sqlalchemy.engine.Engine:
+        """In-memory SQLite engine whose single connection is shared by every thread.
+
+        With the default per-thread pool each thread would see its own, empty database.
+        """
+        return create_engine(connection_string, poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+    def close(self) -> None:
+        """Release a private in-memory database; shared engines stay pooled for other handlers."""
+        if self.engine is not None and is_private_database(str(self.engine.url)):
+            self.engine.dispose()
+
+    @property
+    def llm(self) -> Optional["ChatOpenAI"]:
+        """The language model used for SQL generation, created on first use if an engine is available."""
+        return get_llm(model="gpt-4o", temperature=0.1) if self.engine else None
 
     def load_file(self) -> pd.DataFrame:
         """Load file based on its extension and return a DataFrame."""
@@ -49,82 +123,181 @@ class FileHandler:
 
         loader = loaders.get(file_extension)
         if loader:
-            return loader()
+            return self._load_with_cache(loader)
         elif self.file_path.startswith('sql://'):
             return self._load_sql_query()
         else:
             raise ValueError(f"Unsupported file type: {self.file_path}")
 
-    def _load_excel(self) -> pd.DataFrame:
-        """Read Excel file and return a DataFrame."""
+    def _load_with_cache(self, loader: Callable[[], Union[pd.DataFrame, Dict[str, pd.DataFrame]]]) -> pd.DataFrame:
+        """Return the cached parse of the file if it is current, otherwise parse, compact and cache it.
+
+        Loaders return a DataFrame, or named frames for files holding several tables;
+        all of them end up in self.frames and the first one is returned.
+        """
+        # A column filter given as a function has no stable identity to cache under
+        use_cache = self.use_cache and parse_cache.available and not callable(self.usecols)
+        variant = self._cache_variant()
+        if use_cache:
+            frames = parse_cache.get(self.file_path, variant)
+            if frames:
+                self.frames = frames
+                return next(iter(frames.values()))
+
+        result = loader()
+        if isinstance(result, pd.DataFrame):
+            if get_profile(result) is not None:  # Streamed tables are only a sample
+                self.frames = {os.path.basename(self.file_path): result}
+                return result
+            result = {os.path.basename(self.file_path): result}
+        if self.compact:
+            for name, df in result.items():
+                result[name], self.compaction_reports[name] = compact_dataframe(df)
+
+        self.frames = result
+        if not self.frames:
+            return pd.DataFrame()
+        df = next(iter(self.frames.values()))
+        if use_cache and self.error is None:
+            parse_cache.put(self.file_path, self.frames, variant)
+        return df
+
+    def _cache_variant(self) -> str:
+        """Distinguishes cache entries of the same file loaded with or without compaction,
+        or with different sheet or column selections."""
+        variant = "compact" if self.compact else "raw"
+        if self.sheets is None and self.usecols is None:
+            return variant
+        sheets = None if self.sheets is None else list(self.sheets)
+        usecols = self.usecols if self.usecols is None or isinstance(self.usecols, str) else list(self.usecols)
+        return f"{variant}|{(sheets, usecols)!r}"
+
+    def _load_excel(self) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """Read the selected sheets of an Excel file, each as a frame named after its sheet.
+
+        The workbook is opened once and only the selected sheets are read; columns
+        outside usecols are dropped while reading. Blank sheets are skipped, and a
+        single sheet is returned as one DataFrame named after the file.
+        """
         try:
-            return pd.read_excel(self.file_path)
+            with pd.ExcelFile(self.file_path, engine=EXCEL_ENGINE) as workbook:
+                names = workbook.sheet_names if self.sheets is None else [
+                    workbook.sheet_names[sheet] if isinstance(sheet, int) else sheet for sheet in self.sheets
+                ]
+                frames = {}
+                for name in names:
+                    usecols = self._sheet_usecols(workbook, name)
+                    if usecols == []:
+                        continue  # None of the selected columns are on this sheet
+                    df = workbook.parse(name, usecols=usecols)
+                    if len(df.columns):
+                        frames[name] = df
+            if len(frames) == 1:
+                return next(iter(frames.values()))
+            return frames or pd.DataFrame()
         except Exception as e:
-            print(f"Error reading Excel file {self.file_path}: {str(e)}")
+            self._report_error(f"Error reading Excel file {self.file_path}: {str(e)}")
             return pd.DataFrame()
 
+    def _sheet_usecols(self, workbook: pd.ExcelFile, sheet: str) -> Optional[ColumnSelection]:
+        """usecols for one sheet, so a column missing from some sheets does not fail the workbook.
+
+        Names become a membership test; positions are cut to the sheet's width, read
+        from its header row. Column ranges ("A:C") and callables are passed through.
+        """
+        if self.usecols is None or isinstance(self.usecols, str) or callable(self.usecols):
+            return self.usecols
+        if all(isinstance(column, int) for column in self.usecols):
+            width = len(workbook.parse(sheet, nrows=0).columns)
+            return [column for column in self.usecols if column < width]
+        wanted = set(self.usecols)
+        return lambda column: column in wanted
+
     def _load_csv(self) -> pd.DataFrame:
         """Read CSV file and return a DataFrame."""
         try:
+            if self.chunksize or os.path.getsize(self.file_path) > STREAMING_THRESHOLD_BYTES:
+                return self._stream(pd.read_csv(self.file_path, chunksize=self.chunksize or DEFAULT_CHUNKSIZE))
             return pd.read_csv(self.file_path)
         except Exception as e:
-            print(f"Error reading CSV file {self.file_path}: {str(e)}")
+            self._report_error(f"Error reading CSV file {self.file_path}: {str(e)}")
             return pd.DataFrame()
 
-    def _load_pdf(self) -> pd.DataFrame:
-        """Read PDF file and return a DataFrame."""
+    def _load_pdf(self) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """Read PDF file and return its text, followed by a DataFrame per table found in it.
+
+        Pages are extracted in parallel across worker processes.
+        """
         try:
-            with pdfplumber.open(self.file_path) as pdf:
-                text_data = [page.extract_text() for page in pdf.pages]
-            return pd.DataFrame({'Content': ["\n".join(text_data)]})
+            pages = list(extract_pdf(self.file_path, self.workers))
+            text = pd.DataFrame({'Content': ["\n".join(page.text for page in pages)]})
+            return {os.path.basename(self.file_path): text, **tables_to_frames(pages)}
         except Exception as e:
-            print(f"Error reading PDF file {self.file_path}: {str(e)}")
+            self._report_error(f"Error reading PDF file {self.file_path}: {str(e)}")
             return pd.DataFrame()
 
     def _load_docx(self) -> pd.DataFrame:
         """Read DOCX file and return a DataFrame."""
+        from docx import Document as DocxDocument  # Deferred so start-up does not pay for DOCX support
+
         try:
             doc = DocxDocument(self.file_path)
             paragraphs = [para.text for para in doc.paragraphs]
             return pd.DataFrame({'Content': ["\n".join(paragraphs)]})
         except Exception as e:
-            print(f"Error reading DOCX file {self.file_path}: {str(e)}")
+            self._report_error(f"Error reading DOCX file {self.file_path}: {str(e)}")
             return pd.DataFrame()
 
-    def _load_sql_file(self) -> pd.DataFrame:
-        """Read SQL file, execute the queries, and return a DataFrame."""
+    def _load_sql_file(self) -> Dict[str, pd.DataFrame]:
+        """Execute a SQL script and return every table it creates, keyed by table name."""
         if not self.engine:
             raise ValueError("No engine available for executing SQL file.")
         try:
-            with open(self.file_path, 'r') as file:
-                sql_commands = file.read().split(';')
+            with open(self.file_path, 'r', encoding='utf-8-sig') as file:
+                statements = split_sql_statements(file.read())
+            execute_sql_script(self.engine, statements)
+
             with self.engine.connect() as conn:
-                for command in sql_commands:
-                    command = command.strip()
-                    if command:
-                        conn.execute(text(command))
-                
-                tables = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table';")).fetchall()
-                if tables:
-                    table_name = tables[0][0]
-                    return pd.read_sql(f"SELECT * FROM {table_name}", conn)
-                else:
-                    print(f"No tables found after executing SQL file {self.file_path}.")
-                    return pd.DataFrame()
+                tables = conn.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+                ).fetchall()
+                if not tables:
+                    self._report_error(f"No tables found after executing SQL file {self.file_path}.")
+                    return {}
+                return {
+                    name: pd.read_sql(text(f"SELECT * FROM {quote_identifier(name)}"), conn)
+                    for (name,) in tables
+                }
         except (SQLAlchemyError, IOError) as e:
-            print(f"Error reading SQL file {self.file_path}: {str(e)}")
-            return pd.DataFrame()
+            self._report_error(f"Error reading SQL file {self.file_path}: {str(e)}")
+            return {}
 
     def _load_sql_query(self) -> pd.DataFrame:
         """Execute a SQL query and return the result as a DataFrame."""
         connection_string, query = self._extract_sql_params(self.file_path)
         try:
-            engine = create_engine(connection_string)
+            if is_private_database(connection_string):
+                engine = self._create_private_engine(connection_string)
+            else:
+                engine = get_engine(connection_string)
+            if self.chunksize:
+                with engine.connect().execution_options(stream_results=True) as conn:
+                    return self._stream(pd.read_sql(text(query), conn, chunksize=self.chunksize))
             return pd.read_sql(query, engine)
         except Exception as e:
-            print(f"Error executing SQL query: {str(e)}")
+            self._report_error(f"Error executing SQL query: {str(e)}")
             return pd.DataFrame()
 
+    def _report_error(self, message: str) -> None:
+        """Print a loader error and keep it in self.error for callers loading files in bulk."""
+        print(message)
+        self.error = message
+
+    @staticmethod
+    def _stream(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+        """Profile a table chunk by chunk and return its row sample with the profile attached."""
+        return TableProfile.from_chunks(chunks).to_dataframe()
+
     def _extract_sql_params(self, file_path: str) -> tuple[str, str]:
         """Extract SQL connection string and query from the file path."""
         # This is a placeholder implementation. You should customize this based on your needs.
@@ -151,12 +324,83 @@ class FileHandler:
         except Exception as e:
             return f"Error executing SQL: {str(e)}"
 
-    def execute_sql_query(self, query: str) -> pd.DataFrame:
-        """Execute a raw SQL query and return the result as a DataFrame."""
+    def execute_sql_query(self, query: str, chunksize: Optional[int] = None, raise_errors: bool = False) -> pd.DataFrame:
+        """Execute a raw SQL query and return the result as a DataFrame.
+
+        With a chunksize the result is read through a server-side cursor and profiled
+        chunk by chunk; the returned frame is then a row sample carrying the profile.
+        Errors are printed and give an empty frame unless raise_errors is set.
+        """
         if not self.engine:
             raise ValueError("No database connection available.")
         try:
+            if chunksize:
+                with self.engine.connect().execution_options(stream_results=True) as conn:
+                    return self._stream(pd.read_sql(text(query), conn, chunksize=chunksize))
             return pd.read_sql(query, self.engine)
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error executing SQL query: {str(e)}")
-            return pd.DataFrame()
\ No newline at end of file
+            return pd.DataFrame()
+
+
+class LoadResult(NamedTuple):
+    """Outcome of loading one file: its named frames or an error message."""
+    file_path: str
+    frames: Optional[Dict[str, pd.DataFrame]]
+    error: Optional[str]
+
+    @property
+    def df(self) -> Optional[pd.DataFrame]:
+        """The file's primary (first) frame."""
+        if self.frames is None:
+            return None
+        return next(iter(self.frames.values()), pd.DataFrame())
+
+
+def _load_frames(file_path: str, workers: Optional[int] = None, sheets: Optional[SheetSelection] = None,
+                 usecols: Optional[ColumnSelection] = None) -> Dict[str, pd.DataFrame]:
+    """Load a single file; runs inside a worker process. Raises ValueError if it could not be read."""
+    handler = FileHandler(file_path, workers=workers, sheets=sheets, usecols=usecols)
+    handler.close()
+    if handler.error is not None:
+        raise ValueError(handler.error)
+    if not handler.frames:
+        raise ValueError(f"No data found in {file_path}")
+    return handler.frames
+
+
+def load_files_concurrently(file_paths: Sequence[str], max_workers: Optional[int] = None,
+                            sheets: Optional[SheetSelection] = None,
+                            usecols: Optional[ColumnSelection] = None) -> List[LoadResult]:
+    """Load files on a process pool, keeping input order and collecting errors per file.
+
+    Parsing Excel, PDF and DOCX files is CPU-bound and holds the GIL, so files are
+    parsed in separate processes. max_workers defaults to one worker per file, capped
+    at the CPU count; a single file (or max_workers=1) is loaded in-process.
+    sheets and usecols select what is read from Excel files (see FileHandler); a
+    callable usecols must be picklable when several files are loaded.
+    """
+    if not file_paths:
+        return []
+    workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+    if workers <= 1 or len(file_paths) == 1:
+        results = []
+        for file_path in file_paths:
+            try:
+                results.append(LoadResult(file_path, _load_frames(file_path, None, sheets, usecols), None))
+            except Exception as e:
+                results.append(LoadResult(file_path, None, str(e)))
+        return results
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Files are already loaded in parallel, so each one extracts its PDF pages in-process
+        futures = [pool.submit(_load_frames, file_path, 1, sheets, usecols) for file_path in file_paths]
+        for file_path, future in zip(file_paths, futures):
+            try:
+                results.append(LoadResult(file_path, future.result(), None))
+            except Exception as e:
+                results.append(LoadResult(file_path, None, str(e)))
+    return results
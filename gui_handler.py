@@ -1,11 +1,20 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+from tkinter import filedialog, messagebox, scrolledtext, simpledialog
 import tkinter.font as tkfont
+import asyncio
+import difflib
 import threading
-import time
-from typing import Any, Callable
+import queue
+from typing import Any, Callable, List, Optional, Union
 import re
-from spellchecker import SpellChecker
+from spelling import QuestionSpellChecker, vocabulary_from_frames
+from transcript import DEFAULT_MAX_CHARS, DEFAULT_MAX_TURNS, Transcript
+
+# How often the Tk thread picks up streamed response chunks
+STREAM_POLL_MS = 30
+# Paged-out turns brought back into the result pane each time it is scrolled to the top
+EARLIER_TURNS_PAGE = 10
+TURN_SEPARATOR = "\n" + "-" * 40 + "\n\n"
 
 class Tooltip:
     """Class to create tooltips for widgets"""
@@ -34,12 +43,26 @@ class Tooltip:
             self.tooltip = None
 
 class GUIHandler:
-    def __init__(self, root: tk.Tk, app: Any):
+    def __init__(self, root: tk.Tk, app: Any, max_result_turns: int = DEFAULT_MAX_TURNS,
+                 max_result_chars: int = DEFAULT_MAX_CHARS):
+        """The result pane holds at most max_result_turns turns and max_result_chars characters;
+        older turns are paged out to disk and brought back when the pane is scrolled to the top
+        or the "load older" button is pressed.
+        """
         self.root = root
         self.app = app
         self.voice_response_enabled = tk.BooleanVar(value=True)
         self.stop_event = threading.Event()
         self.query_in_progress = False  # Flag to prevent duplicate submissions
+        # Response chunks from the query thread; None marks the end of a response
+        self.response_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.response_parts: List[str] = []  # Chunks of the response being displayed
+        self.response_complete = False  # Only complete responses are spoken, not timeouts or errors
+        self.transcript: Transcript = Transcript(max_result_turns, max_result_chars)
+        self.first_displayed_turn = 0  # Turns before this one are only in the transcript
+        self.loading_earlier_turns = False
+        # Loaded once; column names and categorical values of loaded files are never "corrected"
+        self.spell_checker: QuestionSpellChecker = QuestionSpellChecker()
 
         self.configure_root()
         self.create_widgets()
@@ -49,7 +72,9 @@ class GUIHandler:
 
     def on_closing(self):
         """Handle the window closing event."""
-        self.app.stop_voice_assistant()
+        self.stop_event.set()
+        self.app.shutdown()
+        self.transcript.close()
         self.root.destroy()
 
         
@@ -95,6 +120,7 @@ class GUIHandler:
         self.query_entry.bind("<FocusOut>", self._restore_placeholder)  # Restore placeholder on focus out
         self.query_entry.bind("<Shift-Return>", self._new_line)  # Move to new line with Shift+Enter
         self.query_entry.bind("<Return>", self.submit_query)  # Submit query with Enter
+        self.root.bind("<Escape>", self.cancel_query)  # Cancel the running query with Escape
 
         self.voice_response_button = self._create_button(self.query_frame, "🔊", self.toggle_voice_response, "Toggle voice response on/off")
         self._create_button(self.query_frame, "🎤", self.use_microphone, "Use microphone for voice input")
@@ -128,9 +154,13 @@ class GUIHandler:
         self.files_listbox.pack(fill=tk.X, pady=5)
 
     def _create_result_text(self) -> None:
-        """Create the text area for displaying results."""
+        """Create the text area for displaying results, below a button that brings back paged-out turns."""
+        self.load_older_button = tk.Button(self.root, text="Load older messages", command=self.load_earlier_turns,
+                                           bg="#4A4A4A", fg="white", font=self.font, state=tk.DISABLED)
+        self.load_older_button.pack(padx=10, anchor=tk.W)
         self.result_text = scrolledtext.ScrolledText(self.root, wrap=tk.WORD, height=15, font=self.font, bg="#1E1E1E", fg="white", insertbackground='white', padx=10, pady=10)
         self.result_text.pack(pady=10, padx=10, fill=tk.BOTH, expand=True)
+        self.result_text.configure(yscrollcommand=self._on_result_scroll)
 
     def select_files(self) -> None:
         """Open a file dialog and load selected files."""
@@ -139,10 +169,25 @@ class GUIHandler:
             filetypes=[("All files", "*.*")]
         )
         if file_paths:
-            result = self.app.load_files(file_paths)
+            sheets = usecols = None
+            if any(path.lower().endswith(('.xlsx', '.xls')) for path in file_paths):
+                sheets = self._ask_selection("Excel sheets", "Sheets to load, by name or number (blank = all):")
+                usecols = self._ask_selection("Excel columns", "Columns to keep, by name or number (blank = all):")
+            result = self.app.load_files(file_paths, sheets=sheets, usecols=usecols)
             self.update_files_listbox()
+            self.update_protected_vocabulary()
             messagebox.showinfo("Info", result)
 
+    def _ask_selection(self, title: str, prompt: str) -> Optional[List[Union[str, int]]]:
+        """Ask for a comma-separated selection; numbers are positions (from 0), None means everything."""
+        answer = simpledialog.askstring(title, prompt, parent=self.root)
+        items = [item.strip() for item in (answer or "").split(",") if item.strip()]
+        if not items:
+            return None
+        if all(item.isdigit() for item in items):
+            return [int(item) for item in items]
+        return items
+
     def remove_files(self) -> None:
         """Remove selected files."""
         selected_files = [self.files_listbox.get(i) for i in self.files_listbox.curselection()]
@@ -151,16 +196,29 @@ class GUIHandler:
             return
         result = self.app.remove_files(selected_files)
         self.update_files_listbox()
+        self.update_protected_vocabulary()
         messagebox.showinfo("Info", result)
 
     def update_files_listbox(self) -> None:
-        """Update the Listbox to display the attached files."""
-        self.files_listbox.delete(0, tk.END)
-        for file_path in self.app.file_paths:
-            self.files_listbox.insert(tk.END, file_path)
-
-    def submit_query(self, event: tk.Event = None) -> None:
-        """Handle the query submission and respond."""
+        """Update the Listbox to display the attached files, touching only the entries that changed."""
+        shown = list(self.files_listbox.get(0, tk.END))
+        matcher = difflib.SequenceMatcher(None, shown, list(self.app.file_paths), autojunk=False)
+        # Applied from the end so earlier indexes stay valid
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            if i2 > i1:
+                self.files_listbox.delete(i1, i2 - 1)
+            for offset, file_path in enumerate(self.app.file_paths[j1:j2]):
+                self.files_listbox.insert(i1 + offset, file_path)
+
+    def update_protected_vocabulary(self) -> None:
+        """Protect the words of the loaded files' column names and categories from spell correction."""
+        frames = [df for file_frames in self.app.file_frames.values() for df in file_frames.values()]
+        self.spell_checker.protect(vocabulary_from_frames(frames))
+
+    def submit_query(self, event: tk.Event = None, from_voice: bool = False) -> None:
+        """Handle the query submission and respond; voice transcripts are standardized first."""
         if self.query_in_progress:
             return  # Prevent duplicate queries
         
@@ -176,54 +234,134 @@ class GUIHandler:
         question = self._check_spelling_and_spacing(question)
 
         self.stop_event.clear()
-        response_thread = threading.Thread(target=self.process_query, args=(question,))
-        response_thread.start()
+        self.start_response()
+        # The scheduler's callbacks run on its event loop thread, so they only fill the queue
+        self.app.scheduler.submit(
+            lambda: self.app.astream_query(question, from_voice),
+            on_chunk=self.response_queue.put,
+            on_done=self._on_response_done,
+            stop_event=self.stop_event,
+        )
+        self.root.after(STREAM_POLL_MS, self.stream_text)
+
+    def cancel_query(self, event: tk.Event = None) -> None:
+        """Cancel the query in progress, abandoning its LLM request."""
+        if self.query_in_progress:
+            self.stop_event.set()
 
     def _check_spelling_and_spacing(self, text: str) -> str:
         """Check and correct spelling and spacing in the given text."""
-        spell = SpellChecker()
-        words = text.split()
-        corrected_words = [spell.correction(word) if spell.correction(word) else word for word in words]
-        corrected_text = " ".join(corrected_words)
+        corrected_text = self.spell_checker.correct(text)
         corrected_text = re.sub(r'\s+', ' ', corrected_text).strip()
         return corrected_text
 
-    def process_query(self, question: str) -> None:
-        """Process the query and handle the response."""
-        response = self.app.handle_query(question)
-        if not self.stop_event.is_set():
-            self.stream_text(response)
-            if not self.stop_event.is_set():
-                time.sleep(2)
-                error = self.app.respond(response, self.voice_response_enabled.get())
-                if error:
-                    messagebox.showwarning("Warning", error)
-        self.query_in_progress = False
-
-    def stream_text(self, response: str) -> None:
-        """Display the response text incrementally."""
-        existing_text = self.result_text.get("1.0", tk.END).strip()
-        
-        # Insert a single separation line before adding the new response
-        if existing_text:
-            self.result_text.insert(tk.END, "\n" + "-"*40 + "\n\n")  # Single line separator
-        
-        # Adding new response
-        chunk_size = 100
-        for i in range(0, len(response), chunk_size):
-            if self.stop_event.is_set():
+    def _on_response_done(self, error: Optional[BaseException]) -> None:
+        """Mark the end of the response in the queue, noting why it stopped early."""
+        self.response_complete = error is None  # Set before the end marker the Tk thread waits for
+        if isinstance(error, asyncio.CancelledError):
+            self.response_queue.put("\n[Cancelled]")
+        elif isinstance(error, asyncio.TimeoutError):
+            self.response_queue.put(f"\n[Timed out] {str(error)}")
+        elif error is not None:
+            self.response_queue.put(f"\nError while answering: {str(error)}")
+        self.response_queue.put(None)
+
+    def start_response(self) -> None:
+        """Prepare the result area for a new response."""
+        self.response_parts = []
+        self.response_complete = False
+        index = len(self.transcript)
+        if index > 0:
+            self.result_text.insert(tk.END, TURN_SEPARATOR)  # Ends the previous turn, and is trimmed with it
+        # Each turn starts at a mark, so turns can be trimmed from the top of the pane
+        self.result_text.mark_set(f"turn{index}", "end-1c")
+        self.result_text.mark_gravity(f"turn{index}", tk.LEFT)
+
+    def stream_text(self) -> None:
+        """Display response chunks as they arrive; runs on the Tk thread via after().
+
+        Chunks that arrived since the last call are inserted at once, and the pane only
+        follows the response if it was already scrolled to the bottom.
+        """
+        finished = False
+        batch = []
+        while True:
+            try:
+                chunk = self.response_queue.get_nowait()
+            except queue.Empty:
                 break
-            self.result_text.insert(tk.END, response[i:i+chunk_size])
-            self.result_text.yview(tk.END)
-            time.sleep(0.1)
+            if chunk is None:
+                finished = True
+                break
+            batch.append(chunk)
+        if batch:
+            following = self.result_text.yview()[1] >= 1.0
+            self.response_parts.extend(batch)
+            self.result_text.insert(tk.END, "".join(batch))
+            if following:
+                self.result_text.yview(tk.END)
+
+        if not finished:
+            self.root.after(STREAM_POLL_MS, self.stream_text)
+            return
+        self.query_in_progress = False
+        self._finish_turn("".join(self.response_parts))
+        if self.response_complete and not self.stop_event.is_set():
+            error = self.app.respond("".join(self.response_parts), self.voice_response_enabled.get())
+            if error:
+                messagebox.showwarning("Warning", error)
+
+    def _finish_turn(self, text: str) -> None:
+        """Record the displayed response in the transcript and trim the turns it paged out from the pane."""
+        self.transcript.append(text)
+        first_kept = self.transcript.paged_out
+        if first_kept <= self.first_displayed_turn:
+            return
+        self.result_text.delete("1.0", f"turn{first_kept}")
+        for index in range(self.first_displayed_turn, first_kept):
+            self.result_text.mark_unset(f"turn{index}")
+        self.first_displayed_turn = first_kept
+        self.load_older_button.config(state=tk.NORMAL)
+
+    def _on_result_scroll(self, first: str, last: str) -> None:
+        """Update the scrollbar; reaching the top of the pane brings back earlier turns."""
+        self.result_text.vbar.set(first, last)
+        at_top = float(first) <= 0.0 and float(last) < 1.0
+        if at_top and self.first_displayed_turn > 0 and not self.loading_earlier_turns:
+            self.loading_earlier_turns = True
+            self.root.after_idle(self.load_earlier_turns)
+
+    def load_earlier_turns(self) -> None:
+        """Insert the previous page of paged-out turns at the top of the result pane.
+
+        Runs when the pane is scrolled to the top, or from the "load older" button when
+        the remaining turns fit in view and the pane cannot scroll.
+        """
+        self.loading_earlier_turns = False
+        if self.first_displayed_turn == 0:
+            return
+        end = self.first_displayed_turn
+        start = max(0, end - EARLIER_TURNS_PAGE)
+        for index, text in reversed(list(zip(range(start, end), self.transcript.read(start, end)))):
+            # The mark of the turn below sits at the insertion point and has to move along with it
+            self.result_text.mark_gravity(f"turn{index + 1}", tk.RIGHT)
+            self.result_text.insert("1.0", text + TURN_SEPARATOR)
+            self.result_text.mark_gravity(f"turn{index + 1}", tk.LEFT)
+            self.result_text.mark_set(f"turn{index}", "1.0")
+            self.result_text.mark_gravity(f"turn{index}", tk.LEFT)
+        self.first_displayed_turn = start
+        if start == 0:
+            self.load_older_button.config(state=tk.DISABLED)
+        self.result_text.yview(f"turn{end}")  # Keep the turn that was at the top in view
 
     def use_microphone(self) -> None:
         """Handle microphone input."""
-        question = self.app.voice_assistant.get_query() if self.app.voice_assistant else ""
+        # Standardized as part of the query pipeline, where it can be cancelled and timed
+        question = self.app.voice_assistant.get_query(standardize=False) if self.app.voice_assistant else ""
         if question:
             self.query_entry.delete("1.0", tk.END)
             self.query_entry.insert("1.0", question)
-            self.submit_query()
+            self.submit_query(from_voice=True)
         else:
             messagebox.showwarning("Warning", "No Microphone detected or input not recognized.")
 
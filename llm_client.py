@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+# Load environment variables (API KEY)
+load_dotenv()
+
+_clients: Dict[Tuple[str, float], "ChatOpenAI"] = {}
+_factory: Optional[Callable[[str, float], Any]] = None
+_embeddings: Dict[str, "OpenAIEmbeddings"] = {}
+_lock = threading.Lock()
+
+
+def get_llm(model: str = "gpt-4o", temperature: float = 0.5) -> "ChatOpenAI":
+    """Return the shared chat client for model and temperature, creating it on first use.
+
+    langchain_openai is imported here rather than at module level because importing
+    it accounts for a large share of application start-up time.
+    """
+    key = (model, temperature)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if _factory is not None:
+                client = _clients[key] = _factory(model, temperature)
+            else:
+                from langchain_openai import ChatOpenAI
+                client = _clients[key] = ChatOpenAI(model=model, temperature=temperature)
+        return client
+
+
+def set_llm_factory(factory: Optional[Callable[[str, float], Any]]) -> None:
+    """Create chat clients with factory(model, temperature) instead of ChatOpenAI (None restores it).
+
+    Clients created earlier are discarded. Used to run offline, e.g. with StubChatModel.
+    """
+    global _factory
+    with _lock:
+        _factory = factory
+        _clients.clear()
+
+
+def llm_identity(model: str) -> str:
+    """Name of what answers for model, for keying cached answers.
+
+    With a factory override (e.g. the offline stub) answers are not the model's, so
+    they must never be served as the real model's answers.
+    """
+    with _lock:
+        factory = _factory
+    if factory is None:
+        return model
+    name = getattr(factory, "__qualname__", type(factory).__qualname__)
+    return f"{model}@{getattr(factory, '__module__', '')}.{name}"
+
+
+class StubMessage:
+    """The part of a langchain message the application reads."""
+    def __init__(self, content: str):
+        self.content: str = content
+
+
+class StubChatModel:
+    """Offline stand-in for ChatOpenAI with deterministic replies.
+
+    Replies echo the last question in the prompt; requests for a JSON query plan get
+    {"language": "none"}, so callers fall back to their prompt-based path. latency
+    simulates time to first token and token_delay the time between streamed tokens.
+    """
+    def __init__(self, model: str = "stub", temperature: float = 0.0, latency: float = 0.0, token_delay: float = 0.0):
+        self.model: str = model
+        self.temperature: float = temperature
+        self.latency: float = latency
+        self.token_delay: float = token_delay
+
+    def _reply(self, prompt: Union[str, List[Any]]) -> str:
+        text = prompt if isinstance(prompt, str) else "\n".join(str(part) for part in prompt)
+        if "Reply with JSON only" in text:
+            return '{"language": "none", "query": ""}'
+        questions = [line for line in text.splitlines() if line.startswith("Question: ")]
+        question = questions[-1][len("Question: "):] if questions else text[-200:]
+        return f"Stub answer to: {question} (prompt of {len(text)} characters)"
+
+    def _tokens(self, prompt: Union[str, List[Any]]) -> List[str]:
+        return [word + " " for word in self._reply(prompt).split()]
+
+    def invoke(self, prompt: Union[str, List[Any]]) -> StubMessage:
+        time.sleep(self.latency + self.token_delay * len(self._tokens(prompt)))
+        return StubMessage(self._reply(prompt))
+
+    async def ainvoke(self, prompt: Union[str, List[Any]]) -> StubMessage:
+        await asyncio.sleep(self.latency + self.token_delay * len(self._tokens(prompt)))
+        return StubMessage(self._reply(prompt))
+
+    def stream(self, prompt: Union[str, List[Any]]) -> Iterator[StubMessage]:
+        time.sleep(self.latency)
+        for token in self._tokens(prompt):
+            yield StubMessage(token)
+            time.sleep(self.token_delay)
+
+    async def astream(self, prompt: Union[str, List[Any]]) -> AsyncIterator[StubMessage]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(prompt):
+            yield StubMessage(token)
+            await asyncio.sleep(self.token_delay)
+
+
+def get_embeddings(model: str = "text-embedding-3-small") -> "OpenAIEmbeddings":
+    """Return the shared embeddings client for model, creating it on first use."""
+    with _lock:
+        client = _embeddings.get(model)
+        if client is None:
+            from langchain_openai import OpenAIEmbeddings
+            client = _embeddings[model] = OpenAIEmbeddings(model=model)
+        return client
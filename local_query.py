@@ -0,0 +1,307 @@
+import ast
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+from file_handler import FileHandler
+from llm_client import get_llm
+from sql_script import quote_identifier, split_sql_statements
+from table_profile import get_profile
+
+# DataFrame/Series methods and attributes a generated pandas expression may use. Joins
+# (merge) are left to SQL, where a deadline bounds them.
+ALLOWED_ATTRIBUTES = frozenset({
+    "abs", "agg", "aggregate", "all", "any", "astype", "between", "columns", "contains", "count",
+    "cumsum", "day", "describe", "diff", "drop_duplicates", "dropna", "dt", "dtypes", "endswith",
+    "fillna", "filter", "groupby", "head", "iloc", "idxmax", "idxmin", "index", "isin", "isna",
+    "loc", "lower", "max", "mean", "median", "min", "month", "nlargest", "notna",
+    "nsmallest", "nunique", "pct_change", "quantile", "rank", "rename", "reset_index", "round",
+    "set_index", "shape", "size", "sort_index", "sort_values", "startswith", "std", "str", "strip",
+    "sum", "tail", "to_frame", "unique", "upper", "value_counts", "values", "var", "year",
+})
+ALLOWED_BUILTINS: Dict[str, Callable] = {
+    "abs": abs, "len": len, "max": max, "min": min, "round": round, "sorted": sorted, "sum": sum,
+}
+# Methods that look up functions by name (e.g. agg("to_csv", ...)) or call what they are given
+DISPATCHING_METHODS = frozenset({"agg", "aggregate", "apply", "transform"})
+# Operators whose result can grow without bound; their right operand must be a small constant
+GROWING_OPERATORS = (ast.Pow, ast.LShift)
+MAX_CONSTANT_OPERAND = 64
+# Rows of a computed result passed on to the answer prompt
+MAX_RESULT_ROWS = 10_000
+ALLOWED_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Attribute, ast.Call, ast.keyword, ast.Subscript,
+    ast.Slice, ast.Constant, ast.Compare, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.List, ast.Tuple,
+    ast.Dict, ast.operator, ast.cmpop, ast.boolop, ast.unaryop,
+)
+# Wording of questions a query can compute; other questions skip the query-writing LLM call
+COMPUTABLE_QUESTION_PATTERN = re.compile(
+    r"\b(how (many|much)|count|number of|total|sum|average|avg|mean|median|max(imum)?|min(imum)?|"
+    r"highest|lowest|largest|smallest|biggest|most|least|top|bottom|rank(ed|ing)?|percent(age)?|ratio|"
+    r"proportion|share|(greater|less|more|fewer|higher|lower) than|above|below|between|sort(ed)?|"
+    r"order(ed)? by|distinct|unique|per|each|std|standard deviation|variance)\b",
+    re.IGNORECASE,
+)
+SQL_START_PATTERN = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+CODE_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+QUERY_PROMPT = """You translate questions about tables into a query that computes the answer.
+The tables are loaded in SQLite and also available as pandas DataFrames with the same names.
+
+{schema}
+
+Reply with JSON only, in the form {{"language": "sql" | "pandas" | "none", "query": "..."}}.
+- "sql": a single read-only SQLite SELECT statement.
+- "pandas": a single Python expression over the DataFrames (no imports, assignments, lambdas or joins).
+- "none": the question cannot be answered by computing over these tables.
+
+Question: {question}"""
+
+
+class UnsafeQueryError(ValueError):
+    """Raised when a generated query does anything beyond reading the loaded tables."""
+
+
+class LocalQueryResult(NamedTuple):
+    """A query computed locally and the table it produced."""
+    language: str
+    query: str
+    result: pd.DataFrame
+
+
+def evaluate_pandas_expression(expression: str, frames: Dict[str, pd.DataFrame]) -> Any:
+    """Evaluate a restricted pandas expression against shallow copies of frames.
+
+    Only names of frames and a few builtins, attribute access from ALLOWED_ATTRIBUTES
+    or to columns (t.col, for column names that are not also pandas attributes),
+    calls, indexing, literals and operators are accepted; anything else (imports,
+    dunder access, lambdas, comprehensions, assignments) raises UnsafeQueryError.
+    So do inplace arguments, string or callable arguments to DISPATCHING_METHODS,
+    regex arguments to filter, and operations whose result can grow without bound
+    (9**9**9, "a" * 10**10), because a running evaluation cannot be interrupted.
+    str.contains always matches literally, as a pattern could backtrack indefinitely.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise UnsafeQueryError(f"Not a single expression: {e}") from e
+
+    columns = {column for df in frames.values() for column in df.columns if _is_column_attribute(column)}
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise UnsafeQueryError(f"{type(node).__name__} is not allowed in queries.")
+        if isinstance(node, ast.Name) and node.id not in frames and node.id not in ALLOWED_BUILTINS:
+            raise UnsafeQueryError(f"Unknown name: {node.id}")
+        if isinstance(node, ast.Attribute) and node.attr not in ALLOWED_ATTRIBUTES and node.attr not in columns:
+            raise UnsafeQueryError(f"Attribute not allowed: {node.attr}")
+        if isinstance(node, ast.keyword) and node.arg == "inplace":
+            raise UnsafeQueryError("inplace is not allowed in queries.")
+        if isinstance(node, ast.Call):
+            _check_dispatch(node)
+            _check_patterns(node)
+        if isinstance(node, ast.BinOp):
+            _check_growth(node)
+
+    # Copies, so nothing done to a frame (renaming columns, setting attrs) reaches the loaded data
+    namespace = dict(ALLOWED_BUILTINS, **{name: df.copy(deep=False) for name, df in frames.items()})
+    return eval(compile(tree, "<query>", "eval"), {"__builtins__": {}}, namespace)
+
+
+def _is_column_attribute(column: Any) -> bool:
+    """Whether t.column reaches the column itself rather than a pandas method or attribute."""
+    return (isinstance(column, str) and column.isidentifier() and not column.startswith("_")
+            and not hasattr(pd.DataFrame, column) and not hasattr(pd.Series, column))
+
+
+def _check_patterns(call: ast.Call) -> None:
+    """Make str.contains match literally and reject regex column filters; patterns can backtrack forever."""
+    if not isinstance(call.func, ast.Attribute):
+        return
+    if call.func.attr == "contains":
+        call.keywords = [keyword for keyword in call.keywords if keyword.arg != "regex"]
+        call.keywords.append(ast.keyword(arg="regex", value=ast.Constant(False)))
+        ast.fix_missing_locations(call)
+    elif call.func.attr == "filter" and any(keyword.arg == "regex" for keyword in call.keywords):
+        raise UnsafeQueryError("filter may not be given a regex.")
+
+
+def _check_dispatch(call: ast.Call) -> None:
+    """Reject agg/apply-style calls given a function name or a function to run."""
+    if not isinstance(call.func, ast.Attribute) or call.func.attr not in DISPATCHING_METHODS:
+        return
+    called = {id(node.func) for node in ast.walk(call) if isinstance(node, ast.Call)}
+    for argument in call.args + [keyword.value for keyword in call.keywords]:
+        for node in ast.walk(argument):
+            is_string = isinstance(node, ast.Constant) and isinstance(node.value, str)
+            is_function = isinstance(node, (ast.Name, ast.Attribute)) and id(node) not in called and (
+                isinstance(node, ast.Attribute) or node.id in ALLOWED_BUILTINS
+            )
+            if is_string or is_function:
+                raise UnsafeQueryError(f"{call.func.attr} may not be given function names or functions.")
+
+
+def _check_growth(node: ast.BinOp) -> None:
+    """Reject powers and shifts by anything but a small constant, nested powers, and repeated sequences."""
+    if isinstance(node.op, GROWING_OPERATORS):
+        right = node.right
+        if not (isinstance(right, ast.Constant) and isinstance(right.value, (int, float))
+                and not isinstance(right.value, bool) and abs(right.value) <= MAX_CONSTANT_OPERAND):
+            raise UnsafeQueryError(f"Exponents and shifts must be constants of at most {MAX_CONSTANT_OPERAND}.")
+        if any(isinstance(inner, ast.BinOp) and isinstance(inner.op, GROWING_OPERATORS) for inner in ast.walk(node.left)):
+            raise UnsafeQueryError("Nested exponents and shifts are not allowed.")
+    if isinstance(node.op, ast.Mult):
+        for operand in (node.left, node.right):
+            if isinstance(operand, (ast.List, ast.Tuple)) or (
+                isinstance(operand, ast.Constant) and isinstance(operand.value, (str, bytes))
+            ):
+                raise UnsafeQueryError("Repeating strings and lists is not allowed.")
+
+
+def looks_computable(question: str) -> bool:
+    """Cheap check that a question asks for counts, aggregates, rankings or filters."""
+    return COMPUTABLE_QUESTION_PATTERN.search(question) is not None
+
+
+def table_names(file_frames: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+    """Give every loaded frame a unique identifier-safe table name."""
+    tables: Dict[str, pd.DataFrame] = {}
+    for file_path, frames in file_frames.items():
+        stem = re.sub(r"\W+", "_", file_path.replace("\\", "/").rsplit("/", 1)[-1].rsplit(".", 1)[0])
+        for frame_name, df in frames.items():
+            name = stem if len(frames) == 1 else f"{stem}_{re.sub(r'[^0-9A-Za-z_]+', '_', frame_name)}"
+            name = name.strip("_").lower() or "table"
+            if name[0].isdigit():
+                name = f"t_{name}"
+            base, suffix = name, 2
+            while name in tables:
+                name, suffix = f"{base}_{suffix}", suffix + 1
+            tables[name] = df
+    return tables
+
+
+class LocalQueryEngine:
+    """Answers computable questions by running an LLM-written query on the loaded tables locally.
+
+    The LLM only sees the schema (plus a few example rows) and replies with a SQLite
+    query or a restricted pandas expression, which runs against an in-memory SQLite
+    copy of the tables or the DataFrames themselves. SQL runs on a query-only
+    connection with a time limit. Questions that do not look computable skip the
+    query-writing call.
+    """
+    def __init__(self, model: str = "gpt-4o", timeout: float = 10.0, example_rows: int = 3):
+        self.model: str = model
+        self.timeout: float = timeout
+        self.example_rows: int = example_rows
+        self.tables: Dict[str, pd.DataFrame] = {}
+        self.handler: Optional[FileHandler] = None
+        self._deadline: float = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, file_frames: Dict[str, Dict[str, pd.DataFrame]]) -> None:
+        """Load the frames of every file into a fresh in-memory SQLite database.
+
+        Streamed tables are skipped because only a sample of their rows is in memory.
+        """
+        with self._lock:
+            if self.handler is not None:
+                self.handler.close()
+            self.tables = {
+                name: df for name, df in table_names(file_frames).items()
+                if get_profile(df) is None and 'Content' not in df.columns
+            }
+            self.handler = FileHandler(connection_string="sqlite://")
+            for name, df in self.tables.items():
+                df.to_sql(name, self.handler.engine, index=False, if_exists="replace")
+
+            raw = self.handler.engine.raw_connection()  # The single pooled connection of the private engine
+            try:
+                raw.driver_connection.execute("PRAGMA query_only = ON")
+                raw.driver_connection.set_progress_handler(self._past_deadline, 10000)
+            finally:
+                raw.close()
+
+    def _past_deadline(self) -> int:
+        return 1 if time.monotonic() > self._deadline else 0  # Non-zero aborts the statement
+
+    def schema(self) -> str:
+        """Describe the registered tables for the query-writing prompt."""
+        parts: List[str] = []
+        for name, df in self.tables.items():
+            columns = ", ".join(f"{quote_identifier(str(col))} {df[col].dtype}" for col in df.columns)
+            parts.append(f"Table {name} ({len(df)} rows): {columns}")
+            parts.append(df.head(self.example_rows).to_string(index=False))
+        return "\n".join(parts)
+
+    def generate_query(self, question: str) -> Optional[Dict[str, str]]:
+        """Ask the LLM for a query answering question; None if it says the question is not computable."""
+        prompt = QUERY_PROMPT.format(schema=self.schema(), question=question)
+        return self._parse_reply(get_llm(model=self.model, temperature=0.0).invoke(prompt).content)
+
+    async def agenerate_query(self, question: str) -> Optional[Dict[str, str]]:
+        """Async counterpart of generate_query; cancelling it cancels the LLM request."""
+        prompt = QUERY_PROMPT.format(schema=self.schema(), question=question)
+        response = await get_llm(model=self.model, temperature=0.0).ainvoke(prompt)
+        return self._parse_reply(response.content)
+
+    @staticmethod
+    def _parse_reply(content: str) -> Optional[Dict[str, str]]:
+        try:
+            reply = json.loads(CODE_FENCE_PATTERN.sub("", content.strip()))
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(reply, dict) or reply.get("language") not in ("sql", "pandas") or not reply.get("query"):
+            return None
+        return reply
+
+    def run(self, language: str, query: str) -> pd.DataFrame:
+        """Run a generated query locally and return its result as a DataFrame of at most MAX_RESULT_ROWS rows."""
+        if language == "sql":
+            statements = split_sql_statements(query)
+            if len(statements) != 1 or not SQL_START_PATTERN.match(statements[0]):
+                raise UnsafeQueryError("Only a single SELECT statement is allowed.")
+            with self._lock:
+                self._deadline = time.monotonic() + self.timeout
+                return self.handler.execute_sql_query(statements[0], raise_errors=True).head(MAX_RESULT_ROWS)
+
+        result = evaluate_pandas_expression(query, self.tables)
+        if isinstance(result, pd.Series):
+            result = result.to_frame().reset_index() if result.index.name or result.index.names[0] else result.to_frame()
+        elif not isinstance(result, pd.DataFrame):
+            result = pd.DataFrame({"result": [result]})
+        return result.head(MAX_RESULT_ROWS)
+
+    def answer(self, question: str) -> Optional[LocalQueryResult]:
+        """Compute the data needed to answer question, or None to fall back to the prompt-based path."""
+        if not self.tables or self.handler is None or not looks_computable(question):
+            return None
+        try:
+            reply = self.generate_query(question)
+            if reply is None:
+                return None
+            return LocalQueryResult(reply["language"], reply["query"], self.run(reply["language"], reply["query"]))
+        except Exception as e:
+            print(f"Local query failed, falling back to the table prompt: {str(e)}")
+            return None
+
+    async def aanswer(self, question: str) -> Optional[LocalQueryResult]:
+        """Async counterpart of answer; cancelling it abandons the query-writing call.
+
+        The generated query runs in a worker thread, bounded by the SQL time limit
+        and the pandas expression checks.
+        """
+        if not self.tables or self.handler is None or not looks_computable(question):
+            return None
+        try:
+            reply = await self.agenerate_query(question)
+            if reply is None:
+                return None
+            result = await asyncio.to_thread(self.run, reply["language"], reply["query"])
+            return LocalQueryResult(reply["language"], reply["query"], result)
+        except Exception as e:  # Cancellation is not an Exception, so it propagates
+            print(f"Local query failed, falling back to the table prompt: {str(e)}")
+            return None
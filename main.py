@@ -1,47 +1,103 @@
 import tkinter as tk
+import asyncio
 import threading
-from typing import List, Optional
+import multiprocessing
+import os
+import sys
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
 import pandas as pd
-from file_handler import FileHandler
-from comparison import DataComparer
+from file_handler import ColumnSelection, SheetSelection, load_files_concurrently
+from comparison import ComparisonGraph
+from local_query import LocalQueryEngine, LocalQueryResult, looks_computable
+import engine_registry
+from table_profile import get_profile
 from gui_handler import GUIHandler
 from query_handler import QueryHandler
+from request_scheduler import RequestScheduler
 from voice_assistant import VoiceAssistant
 
 class App:
-    def __init__(self):
+    def __init__(self, load_workers: Optional[int] = None, local_queries: bool = True, voice: bool = True):
         self.dataframes: List[pd.DataFrame] = []
         self.file_paths: List[str] = []
+        self.file_frames: Dict[str, Dict[str, pd.DataFrame]] = {}  # Every table of each file, by path
         self.comparison_summary: str = ""
-        self.voice_assistant: Optional[VoiceAssistant] = None
-        self.microphone_available: bool = self._check_microphone_availability()
+        self.comparison_graph: ComparisonGraph = ComparisonGraph()  # Pair results cached per file path
+        self.load_workers: Optional[int] = load_workers  # Worker processes for file loading (None = auto)
+        # The voice assistant and its audio devices are set up on first voice use (see voice_assistant)
+        self.voice_enabled: bool = voice
+        self._voice_assistant: Optional[VoiceAssistant] = None
+        self._voice_checked: bool = False
+        self._voice_lock: threading.Lock = threading.Lock()
         self.stop_event: threading.Event = threading.Event()
         self.voice_thread: Optional[threading.Thread] = None
 
         # Initialize QueryHandler once
         self.query_handler = QueryHandler()
+        # Computes answers to aggregate/filter questions locally; re-registered lazily after file changes
+        self.local_query_engine: Optional[LocalQueryEngine] = LocalQueryEngine() if local_queries else None
+        self._local_tables_stale: bool = False
+        self._local_tables_lock: threading.Lock = threading.Lock()  # Concurrent questions register once
+        # Runs GUI queries on an event loop thread, with timeouts and cancellation
+        self.scheduler: RequestScheduler = RequestScheduler()
+        # Seconds spent in each stage of the last completed query: standardize, local_query, first_token, answer.
+        # Each query fills its own dict, also kept on the QueryHandler that answered it.
+        self.last_stage_timings: Dict[str, float] = {}
+
+    @property
+    def voice_assistant(self) -> Optional[VoiceAssistant]:
+        """The voice assistant, initialized the first time voice is used; None when voice is unavailable."""
+        with self._voice_lock:
+            if self.voice_enabled and not self._voice_checked:
+                self._voice_checked = True
+                self._check_microphone_availability()
+            return self._voice_assistant
+
+    @property
+    def microphone_available(self) -> bool:
+        return self.voice_assistant is not None
 
     def _check_microphone_availability(self) -> bool:
         """Check if a microphone is available and initialize VoiceAssistant."""
         try:
-            self.voice_assistant = VoiceAssistant(language="en-US")
+            voice_assistant = VoiceAssistant(language="en-US")
+            voice_assistant.initialize_audio()
+            self._voice_assistant = voice_assistant
             return True
         except OSError:
             return False
 
-    def load_files(self, file_paths: List[str]) -> str:
-        """Load selected files and handle multiple file processing if necessary."""
-        new_dataframes = []
-        for file_path in file_paths:
-            try:
-                handler = FileHandler(file_path)
-                new_dataframes.append(handler.df)
-            except Exception as e:
-                return f"Error processing file {file_path}: {str(e)}"
+    def load_files(self, file_paths: List[str], sheets: Optional[SheetSelection] = None,
+                   usecols: Optional[ColumnSelection] = None) -> str:
+        """Load selected files in parallel; files that fail are reported without aborting the batch.
 
-        self.dataframes.extend(new_dataframes)
-        self.file_paths.extend(file_paths)
+        sheets and usecols limit what is read from Excel files to those sheets and columns.
+        """
+        errors = []
+        for result in load_files_concurrently(file_paths, self.load_workers, sheets, usecols):
+            if result.error is not None:
+                errors.append(f"Error processing file {result.file_path}: {result.error}")
+                continue
+            if result.file_path in self.file_paths:  # A reloaded file replaces its earlier version
+                self.dataframes[self.file_paths.index(result.file_path)] = result.df
+                self._remove_from_graph(result.file_path)
+            else:
+                self.dataframes.append(result.df)
+                self.file_paths.append(result.file_path)
+            self.file_frames[result.file_path] = result.frames
+            self._local_tables_stale = True
+            for graph_id, groups, df in self._graph_entries(result.file_path):
+                profile = get_profile(df)  # Streamed tables were hashed while reading them
+                self.comparison_graph.add(graph_id, df, profile.fingerprint if profile else None,
+                                          groups=groups, source=result.file_path)
+                if 'Content' in df.columns and len(df) == 1:  # Chunk and index documents up front
+                    self.query_handler.retriever.index(str(df['Content'].iloc[0]))
         self._update_comparison_summary()
+
+        if errors:
+            loaded = len(file_paths) - len(errors)
+            return "\n".join(errors + [f"{loaded} of {len(file_paths)} files loaded."])
         return "Files successfully loaded."
 
     def remove_files(self, file_paths: List[str]) -> str:
@@ -49,34 +105,162 @@ class App:
         paths_to_remove = set(file_paths)
         self.dataframes = [df for df, path in zip(self.dataframes, self.file_paths) if path not in paths_to_remove]
         self.file_paths = [path for path in self.file_paths if path not in paths_to_remove]
+        for path in paths_to_remove:
+            self._remove_from_graph(path)
+            self.file_frames.pop(path, None)
+        self._local_tables_stale = True
         self._update_comparison_summary()
         return "Files successfully removed."
 
+    def _graph_entries(self, file_path: str) -> List[Tuple[str, Tuple[str, ...], pd.DataFrame]]:
+        """Comparison graph id, groups and frame of each table of a file.
+
+        The file's primary (first) frame is in the default group, so it is compared
+        with every other file's primary frame whatever the names. Named tables
+        (sheets, SQL tables, PDF tables) are "path::name" and are also compared with
+        the same-named table of other files. A frame named after the file (a single
+        table, or a document's text) is the file itself.
+        """
+        entries = []
+        for position, (name, df) in enumerate(self.file_frames.get(file_path, {}).items()):
+            if name == os.path.basename(file_path):
+                entries.append((file_path, ("",), df))
+            else:
+                groups = ("", name) if position == 0 else (name,)
+                entries.append((f"{file_path}::{name}", groups, df))
+        return entries
+
+    def _remove_from_graph(self, file_path: str) -> None:
+        for graph_id, _, _ in self._graph_entries(file_path):
+            self.comparison_graph.remove(graph_id)
+
     def _update_comparison_summary(self) -> None:
-        """Update comparison summary based on the current dataframes."""
+        """Rebuild the comparison summary from the cached pairwise results."""
         if len(self.dataframes) >= 2:
-            comparer = DataComparer(self.dataframes)
-            self.comparison_summary = comparer.process_dataframes()
+            self.comparison_summary = self.comparison_graph.summary(label=os.path.basename) or (
+                "No comparable tables among: " + ", ".join(os.path.basename(path) for path in self.file_paths)
+            )
         else:
             self.comparison_summary = ""
 
-    def handle_query(self, question: str) -> str:
-        """Process the query based on loaded files and return the response."""
-        if self.voice_assistant:
-            standardized_question = self.voice_assistant.standardize_language(question)
-        else:
-            standardized_question = question
+    def set_key_columns(self, key_columns: Optional[List[str]]) -> None:
+        """Align rows on the given columns when comparing files (None infers a key per pair)."""
+        self.comparison_graph.set_key_columns(key_columns)
+        self._update_comparison_summary()
 
-        if standardized_question:
-            # Use the single instance of QueryHandler
-            if len(self.dataframes) == 1:  # Single file processing
-                response = self.query_handler.ask_question(self.dataframes[0], standardized_question)
-            else:  # Multiple file processing
-                response = self.query_handler.ask_question(self.comparison_summary, standardized_question)
+    def handle_query(self, question: str, from_voice: bool = False) -> str:
+        """Process the query based on loaded files and return the response.
 
-            return response
-        else:
-            return "Sorry, I couldn't understand your question."
+        Only voice transcripts (from_voice) are rephrased into standard language first.
+        """
+        return "".join(self.stream_query(question, from_voice)).strip()
+
+    def stream_query(self, question: str, from_voice: bool = False,
+                     query_handler: Optional[QueryHandler] = None) -> Iterator[str]:
+        """Process the query and yield the response in chunks as the answer is generated.
+
+        query_handler answers with its own conversation history instead of the app's.
+        """
+        query_handler = query_handler or self.query_handler
+        timings: Dict[str, float] = {}
+        standardized_question = self._prepare_query(question, from_voice, timings)
+        if not standardized_question:
+            yield "Sorry, I couldn't understand your question."
+            return
+
+        compute = self._local_compute(timings)
+        # Use the single instance of QueryHandler
+        if len(self.dataframes) == 1:  # Single file processing
+            chunks = query_handler.stream_question(self._single_file_content(), standardized_question, compute)
+        else:  # Multiple file processing
+            chunks = query_handler.stream_question(self.comparison_summary, standardized_question, compute)
+
+        yield f"Question: {standardized_question}\n\nAnswer: "
+        yield from chunks
+        self._record_answer_timing(query_handler, timings)
+
+    async def astream_query(self, question: str, from_voice: bool = False,
+                            query_handler: Optional[QueryHandler] = None) -> AsyncIterator[str]:
+        """Async counterpart of stream_query, used by the scheduler; blocking steps run in worker threads."""
+        query_handler = query_handler or self.query_handler
+        timings: Dict[str, float] = {}
+        standardized_question = await asyncio.to_thread(self._prepare_query, question, from_voice, timings)
+        if not standardized_question:
+            yield "Sorry, I couldn't understand your question."
+            return
+
+        compute = self._local_acompute(timings)
+        if len(self.dataframes) == 1:  # Single file processing
+            chunks = query_handler.astream_question(self._single_file_content(), standardized_question, compute)
+        else:  # Multiple file processing
+            chunks = query_handler.astream_question(self.comparison_summary, standardized_question, compute)
+
+        yield f"Question: {standardized_question}\n\nAnswer: "
+        async for chunk in chunks:
+            yield chunk
+        self._record_answer_timing(query_handler, timings)
+
+    def _single_file_content(self) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """The loaded file's DataFrame, or all of its tables when it holds several (sheets, PDF tables)."""
+        frames = self.file_frames.get(self.file_paths[0]) if self.file_paths else None
+        if frames and len(frames) > 1:
+            return frames
+        return self.dataframes[0]
+
+    def _prepare_query(self, question: str, from_voice: bool, timings: Dict[str, float]) -> Optional[str]:
+        """Standardize a voice transcript, timing it into timings."""
+        start = time.perf_counter()
+        if from_voice and self.voice_assistant:
+            question = self.voice_assistant.standardize_language(question)
+        timings["standardize"] = time.perf_counter() - start
+        return question or None
+
+    def _local_compute(self, timings: Dict[str, float]) -> Callable[[str], Optional[LocalQueryResult]]:
+        """_answer_locally, timed into timings; the query handler only calls it on a response cache miss."""
+        def compute(question: str) -> Optional[LocalQueryResult]:
+            start = time.perf_counter()
+            try:
+                return self._answer_locally(question)
+            finally:
+                timings["local_query"] = time.perf_counter() - start
+        return compute
+
+    def _local_acompute(self, timings: Dict[str, float]) -> Callable[[str], Awaitable[Optional[LocalQueryResult]]]:
+        """Async _local_compute: the query-writing call runs in the calling task, so cancelling it interrupts the call."""
+        async def compute(question: str) -> Optional[LocalQueryResult]:
+            start = time.perf_counter()
+            try:
+                if not await asyncio.to_thread(self._local_tables_ready, question):
+                    return None
+                return await self.local_query_engine.aanswer(question)
+            finally:
+                timings["local_query"] = time.perf_counter() - start
+        return compute
+
+    def _record_answer_timing(self, query_handler: QueryHandler, timings: Dict[str, float]) -> None:
+        timing = query_handler.last_timing
+        if timing is not None:
+            if timing.time_to_first_token is not None:
+                timings["first_token"] = timing.time_to_first_token
+            timings["answer"] = timing.total
+        query_handler.last_stage_timings = timings
+        self.last_stage_timings = timings
+
+    def _answer_locally(self, question: str) -> Optional[LocalQueryResult]:
+        """Compute the answer's data with a local SQL/pandas query; None falls back to the table prompt."""
+        if not self._local_tables_ready(question):
+            return None
+        return self.local_query_engine.answer(question)
+
+    def _local_tables_ready(self, question: str) -> bool:
+        """Whether question should be tried locally, registering the loaded tables first if they changed."""
+        if self.local_query_engine is None or not self.file_frames or not looks_computable(question):
+            return False  # Checked before registering, which copies every table into SQLite
+        with self._local_tables_lock:
+            if self._local_tables_stale:
+                self._local_tables_stale = False  # Cleared first, so a load during registering marks it again
+                self.local_query_engine.register(dict(self.file_frames))
+        return True
 
     def respond(self, response: str, voice_response_enabled: bool) -> Optional[str]:
         """Play voice response if enabled."""
@@ -103,6 +287,12 @@ class App:
             self.stop_event.set()
             self.voice_assistant.stop()
 
+    def shutdown(self) -> None:
+        """Stop background work and close pooled database connections."""
+        self.stop_voice_assistant()
+        self.scheduler.shutdown()
+        engine_registry.dispose_all()
+
     def main(self) -> None:
         """Initialize the GUI and start the main loop."""
         root = tk.Tk()
@@ -110,5 +300,9 @@ class App:
         root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for the process pool in PyInstaller builds
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":  # Headless: python main.py batch --help
+        from batch_runner import main as batch_main
+        sys.exit(batch_main(sys.argv[2:], App))
     app = App()
     app.main()
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # The cache is optional; loading works without it
+    pa = None
+    ipc = None
+
+# Bump whenever a loader's output changes so entries written by older code are ignored
+LOADER_VERSION = 6
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "AI_ASSISTANT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ai_assistant"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("AI_ASSISTANT_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+MANIFEST_NAME = "manifest.json"
+
+
+def _encode_label(label: Any) -> List[Any]:
+    """A column label as [type, JSON value]; Arrow itself only keeps labels as strings.
+
+    Raises TypeError for labels that cannot be restored exactly.
+    """
+    if label is None:
+        return ["none", None]
+    if isinstance(label, (bool, np.bool_)):
+        return ["bool", bool(label)]
+    if isinstance(label, (int, np.integer)):
+        return ["int", int(label)]
+    if isinstance(label, (float, np.floating)):
+        return ["float", repr(float(label))]  # As text, so nan and inf survive JSON
+    if isinstance(label, pd.Timestamp):
+        return ["timestamp", label.isoformat()]
+    if isinstance(label, str):
+        return ["str", label]
+    raise TypeError(f"Column label {label!r} of type {type(label).__name__} cannot be cached")
+
+
+def _decode_label(encoded: List[Any]) -> Any:
+    kind, value = encoded
+    if kind == "float":
+        return float(value)
+    if kind == "timestamp":
+        return pd.Timestamp(value)
+    return value
+
+
+def evict_least_recently_used(entries: Iterable[Tuple[float, int, str]], max_bytes: int,
+                              remove: Callable[[str], None]) -> None:
+    """Remove entries, least recently used first, until their total size fits in max_bytes.
+
+    entries are (last used time, size in bytes, entry name); remove deletes one entry.
+    """
+    entries = sorted(entries)
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        remove(entry)
+        total -= size
+
+
+class ParseCache:
+    """On-disk cache of parsed DataFrames stored as Arrow IPC files.
+
+    Entries are keyed on the source file's absolute path, mtime, size and the loader
+    version, so editing a file or changing a loader invalidates its entry. Each entry
+    holds one or more named frames; hits are read through a memory map, and the least
+    recently used entries are evicted once the cache grows past max_bytes.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir: str = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "parsed")
+        self.max_bytes: int = max_bytes
+
+    @property
+    def available(self) -> bool:
+        """True when pyarrow is installed."""
+        return pa is not None
+
+    def key(self, file_path: str, variant: str = "") -> str:
+        """Content-addressed key for the current version of file_path.
+
+        variant separates entries for different load options of the same file.
+        """
+        stat = os.stat(file_path)
+        identity = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{LOADER_VERSION}|{variant}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def get(self, file_path: str, variant: str = "") -> Optional[Dict[str, pd.DataFrame]]:
+        """Return the cached frames for file_path, or None on a miss."""
+        if not self.available:
+            return None
+        try:
+            entry_dir = os.path.join(self.cache_dir, self.key(file_path, variant))
+            manifest_path = os.path.join(entry_dir, MANIFEST_NAME)
+            with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+
+            frames: Dict[str, pd.DataFrame] = {}
+            for name, file_name, columns in manifest["frames"]:
+                with pa.memory_map(os.path.join(entry_dir, file_name), "r") as source:
+                    df = ipc.open_file(source).read_all().to_pandas()
+                df.columns = [_decode_label(label) for label in columns]
+                frames[name] = df
+            os.utime(manifest_path)  # Mark the entry as recently used
+            return frames
+        except (OSError, ValueError, KeyError, pa.ArrowException):
+            return None
+
+    def put(self, file_path: str, frames: Dict[str, pd.DataFrame], variant: str = "") -> bool:
+        """Store frames for file_path. Returns False when they cannot be cached."""
+        if not self.available or not frames:
+            return False
+        try:
+            entry_dir = os.path.join(self.cache_dir, self.key(file_path, variant))
+            if os.path.isdir(entry_dir):
+                return True
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        except OSError:
+            return False
+
+        try:
+            manifest: List[Tuple[str, str, List[List[Any]]]] = []
+            for index, (name, df) in enumerate(frames.items()):
+                file_name = f"{index}.arrow"
+                columns = [_encode_label(label) for label in df.columns]
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                with ipc.new_file(os.path.join(tmp_dir, file_name), table.schema) as writer:
+                    writer.write_table(table)
+                manifest.append((name, file_name, columns))
+            with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as manifest_file:
+                json.dump({"source": os.path.abspath(file_path), "frames": manifest}, manifest_file)
+            os.replace(tmp_dir, entry_dir)  # Atomic, so readers never see a partial entry
+        except (OSError, TypeError, pa.ArrowException) as e:
+            # Another process may have written the same entry first, a column holds
+            # values Arrow cannot represent (e.g. mixed types), or a label cannot be restored
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(entry_dir):
+                print(f"Could not cache parsed data for {file_path}: {str(e)}")
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            entry_dir = os.path.join(self.cache_dir, name)
+            try:
+                last_used = os.stat(os.path.join(entry_dir, MANIFEST_NAME)).st_mtime
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            except OSError:
+                continue
+            entries.append((last_used, size, entry_dir))
+        evict_least_recently_used(entries, self.max_bytes, lambda entry_dir: shutil.rmtree(entry_dir, ignore_errors=True))
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import pandas as pd
+
+# Pages handed to a worker at once; small enough to stream, large enough to amortize opening the file
+PAGES_PER_TASK = 8
+# Files with fewer pages than this are extracted in-process
+MIN_PAGES_FOR_POOL = 2 * PAGES_PER_TASK
+
+Table = List[List[Optional[str]]]
+
+
+class PageResult(NamedTuple):
+    """Text and raw tables (lists of rows of cells) of one PDF page, numbered from 1."""
+    page_number: int
+    text: str
+    tables: List[Table]
+
+
+def page_count(file_path: str) -> int:
+    import pdfplumber  # Deferred so start-up does not pay for PDF support
+
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pages(file_path: str, start: int, stop: int) -> List[PageResult]:
+    """Extract pages start..stop-1 (zero-based); runs inside a worker process."""
+    import pdfplumber
+
+    results = []
+    with pdfplumber.open(file_path) as pdf:
+        for index in range(start, min(stop, len(pdf.pages))):
+            page = pdf.pages[index]
+            tables = [table for table in page.extract_tables() if len(table) > 1]
+            results.append(PageResult(index + 1, page.extract_text() or "", tables))
+            page.flush_cache()  # pdfplumber keeps parsed layout objects per page otherwise
+    return results
+
+
+def extract_pdf(file_path: str, max_workers: Optional[int] = None) -> Iterator[PageResult]:
+    """Yield the pages of a PDF in order, extracting batches of pages in parallel.
+
+    Pages are yielded as soon as every earlier page is done, so callers can consume
+    the start of a long document while the rest is still being extracted.
+    max_workers=1 extracts in-process.
+    """
+    pages = page_count(file_path)
+    workers = max_workers or min(os.cpu_count() or 1, -(-pages // PAGES_PER_TASK))
+    if workers <= 1 or pages < MIN_PAGES_FOR_POOL:
+        yield from extract_pages(file_path, 0, pages)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(extract_pages, file_path, start, start + PAGES_PER_TASK)
+            for start in range(0, pages, PAGES_PER_TASK)
+        ]
+        for future in futures:  # In page order; later batches keep running meanwhile
+            yield from future.result()
+
+
+def _header(row: Sequence[Optional[str]]) -> Optional[List[str]]:
+    """The row as column names if it looks like a header: all cells filled, distinct and not numeric."""
+    cells = [(cell or "").replace("\n", " ").strip() for cell in row]
+    if not all(cells) or len(set(cells)) < len(cells):
+        return None
+    if any(pd.to_numeric(pd.Series(cells), errors="coerce").notna()):
+        return None
+    return cells
+
+
+def tables_to_frames(pages: Sequence[PageResult]) -> Dict[str, pd.DataFrame]:
+    """Turn extracted tables into DataFrames named "Page N table M".
+
+    A table whose first row is a header becomes columns; otherwise columns are
+    numbered. A table that starts a page with the same columns as the last table of
+    the previous page (a repeated header) or with no header and the same width is
+    treated as its continuation.
+    """
+    frames: Dict[str, pd.DataFrame] = {}
+    last_name: Optional[str] = None
+    last_page = 0
+    for page in pages:
+        for index, table in enumerate(page.tables):
+            header = _header(table[0])
+            rows = table[1:] if header else table
+            width = len(table[0])
+            previous = frames.get(last_name) if last_name else None
+            continues = (
+                index == 0 and previous is not None and page.page_number == last_page + 1
+                and len(previous.columns) == width
+                and (header is None or header == [str(col) for col in previous.columns])
+            )
+            if continues:
+                addition = pd.DataFrame(rows, columns=previous.columns)
+                frames[last_name] = pd.concat([previous, addition], ignore_index=True)
+            else:
+                columns = header or [f"Column {i + 1}" for i in range(width)]
+                last_name = f"Page {page.page_number} table {index + 1}"
+                frames[last_name] = pd.DataFrame(rows, columns=columns)
+            last_page = page.page_number
+    return frames
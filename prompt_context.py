@@ -0,0 +1,195 @@
+import threading
+import weakref
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from table_profile import TableProfile, get_profile
+
+DEFAULT_TOKEN_BUDGET = 6000
+# Tables with more cells than this are never rendered in full, whatever the budget
+MAX_FULL_TABLE_CELLS = 20000
+# Columns with at most this many distinct values can be used to stratify the sample
+MAX_STRATA = 50
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Count the tokens text uses for model, estimating 4 characters per token without tiktoken."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class TableContextBuilder:
+    """Turns a DataFrame into prompt context that fits a token budget.
+
+    Small tables are included in full. Larger ones are described by a profile:
+    schema and dtypes, per-column statistics (with the row holding each minimum
+    and maximum), top values, and a sample stratified on a low-cardinality column.
+    Profiles are computed once per DataFrame and cached for as long as the frame
+    is alive; one builder can be shared by handlers answering concurrently.
+    """
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, model: str = "gpt-4o",
+                 sample_rows: int = 40, top_k: int = 5):
+        self.token_budget: int = token_budget
+        self.model: str = model
+        self.sample_rows: int = sample_rows
+        self.top_k: int = top_k
+        self._cache: Dict[int, Tuple[weakref.ref, TableProfile, pd.DataFrame, Dict[str, Tuple[str, str]]]] = {}
+        self._lock = threading.Lock()  # Concurrent requests for a new frame profile it once
+
+    def build(self, df: pd.DataFrame, token_budget: Optional[int] = None) -> str:
+        """Return the context text for df within token_budget (default: the builder's budget)."""
+        budget = self.token_budget if token_budget is None else token_budget
+        if get_profile(df) is None and df.size <= MAX_FULL_TABLE_CELLS:
+            full_table = df.to_string(index=False)
+            if count_tokens(full_table, self.model) <= budget:
+                return full_table
+
+        profile, sample, extremes = self._profile(df)
+        sample_rows, top_k = self.sample_rows, self.top_k
+        while True:
+            text = self._render(profile, sample, extremes, sample_rows, top_k)
+            if count_tokens(text, self.model) <= budget or (sample_rows == 0 and top_k == 0):
+                break
+            if sample_rows > 0:
+                sample_rows //= 2
+            else:
+                top_k = max(top_k - 2, 0)
+        return self.truncate(text, budget)
+
+    def _profile(self, df: pd.DataFrame) -> Tuple[TableProfile, pd.DataFrame, Dict[str, Tuple[str, str]]]:
+        with self._lock:
+            return self._profile_locked(df)
+
+    def _profile_locked(self, df: pd.DataFrame) -> Tuple[TableProfile, pd.DataFrame, Dict[str, Tuple[str, str]]]:
+        cached = self._cache.get(id(df))
+        if cached is not None and cached[0]() is df:
+            return cached[1], cached[2], cached[3]
+
+        profile = get_profile(df)
+        if profile is not None:  # A streamed table: df is already its sample
+            sample, extremes = df, {}
+        else:
+            profile = TableProfile.from_dataframe(df, sample_size=0, fingerprint=False)
+            sample = self._stratified_sample(df, self.sample_rows)
+            extremes = self._extremes(df)
+
+        key = id(df)
+        self._cache[key] = (weakref.ref(df, lambda _: self._cache.pop(key, None)), profile, sample, extremes)
+        return profile, sample, extremes
+
+    @staticmethod
+    def _stratified_sample(df: pd.DataFrame, rows: int, seed: int = 0) -> pd.DataFrame:
+        """Sample about `rows` rows, proportionally from each value of the lowest-cardinality column."""
+        if len(df) <= rows:
+            return df
+        strata_column = None
+        best = MAX_STRATA + 1
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_float_dtype(series):
+                continue
+            distinct = series.nunique(dropna=False)
+            if 1 < distinct < best:
+                strata_column, best = col, distinct
+        if strata_column is None:
+            return df.sample(n=rows, random_state=seed).sort_index()
+
+        rng = np.random.default_rng(seed)
+        keys = pd.Series(rng.random(len(df)), index=df.index)
+        groups = df[strata_column].astype(object).fillna("<missing>")
+        # Rank rows within their group by a random key and keep each group's share (at least one row)
+        rank = keys.groupby(groups).rank(method="first")
+        quota = (groups.map(groups.value_counts()) * rows / len(df)).clip(lower=1)
+        sample = df[rank <= quota]
+        sample.attrs = dict(sample.attrs, stratified_by=strata_column)
+        return sample
+
+    @staticmethod
+    def _extremes(df: pd.DataFrame) -> Dict[str, Tuple[str, str]]:
+        """For each numeric column, label the rows holding its minimum and maximum."""
+        label_column = next(
+            (col for col in df.columns
+             if not pd.api.types.is_numeric_dtype(df[col]) and df[col].is_unique and df[col].notna().all()),
+            None,
+        )
+        if label_column is None:
+            return {}
+        extremes = {}
+        for col in df.select_dtypes(include="number").columns:
+            values = df[col]
+            if values.notna().any():
+                extremes[col] = (str(df.at[values.idxmin(), label_column]), str(df.at[values.idxmax(), label_column]))
+        return extremes
+
+    def _render(self, profile: TableProfile, sample: pd.DataFrame, extremes: Dict[str, Tuple[str, str]],
+                sample_rows: int, top_k: int) -> str:
+        lines: List[str] = [
+            f"Table profile: {profile.row_count} rows x {len(profile.columns)} columns "
+            "(statistics cover every row; only the sample rows below are shown in full).",
+            "Columns:",
+        ]
+        for stats in profile.columns.values():
+            parts = [f"- {stats.name} ({stats.dtype}): {stats.count} non-null"]
+            if stats.nulls:
+                parts.append(f"{stats.nulls} missing")
+            if stats.numeric and stats.count:
+                low = _format_number(stats.minimum)
+                high = _format_number(stats.maximum)
+                if stats.name in extremes:
+                    low = f"{low} ({extremes[stats.name][0]})"
+                    high = f"{high} ({extremes[stats.name][1]})"
+                parts.append(f"min {low}, max {high}, mean {_format_number(stats.mean)}")
+                if stats.std is not None:
+                    parts.append(f"std {_format_number(stats.std)}")
+                parts.append(f"sum {_format_number(stats.total)}")
+            else:
+                if stats.distinct is not None:
+                    parts.append(f"{stats.distinct} distinct")
+                if top_k:
+                    top = ", ".join(f"{value} ({count})" for value, count in stats.top_values(top_k))
+                    parts.append(f"top: {top}")
+            lines.append(", ".join(parts))
+
+        if sample_rows and not sample.empty:
+            shown = sample if len(sample) <= sample_rows else sample.iloc[
+                np.linspace(0, len(sample) - 1, sample_rows).astype(int)
+            ]
+            stratified_by = sample.attrs.get("stratified_by")
+            note = f", stratified by {stratified_by}" if stratified_by else ""
+            lines.append(f"Sample rows ({len(shown)} of {profile.row_count}{note}):")
+            lines.append(shown.to_string(index=False))
+        return "\n".join(lines)
+
+    def truncate(self, text: str, budget: int) -> str:
+        """Cut text down to the budget as a last resort (very wide tables)."""
+        if count_tokens(text, self.model) <= budget:
+            return text
+        lines = text.split("\n")
+        while len(lines) > 1 and count_tokens("\n".join(lines), self.model) > budget:
+            lines = lines[:max(1, len(lines) * 3 // 4)]
+        return "\n".join(lines + ["... (truncated to fit the token budget)"])
+
+
+def _format_number(value: Optional[float]) -> str:
+    if value is None:
+        return "n/a"
+    if float(value).is_integer():
+        return f"{int(value)}"
+    return f"{value:.2f}" if abs(value) >= 1 else f"{value:.4g}"
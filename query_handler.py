@@ -1,57 +1,294 @@
-from dotenv import load_dotenv
+import asyncio
+import time
+from collections import deque
 import pandas as pd
-from langchain_openai import ChatOpenAI
-from typing import Union, List
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Iterator, NamedTuple, Union, List, Optional, Tuple
+from conversation_memory import DEFAULT_HISTORY_BUDGET, ConversationMemory, PromptMetrics
+from llm_client import get_embeddings, get_llm, llm_identity
+from prompt_context import DEFAULT_TOKEN_BUDGET, TableContextBuilder, count_tokens
+from response_cache import ResponseCache
+from retrieval import DEFAULT_TOP_K, DocumentRetriever
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# A table, the named tables of one file, or a comparison summary
+Content = Union[pd.DataFrame, Dict[str, pd.DataFrame], str]
+# Computes the data for a question locally: (language, query, result), or None to use the content as is
+ComputeResult = Callable[[str], Optional[Tuple[str, str, pd.DataFrame]]]
+AsyncComputeResult = Callable[[str], Awaitable[Optional[Tuple[str, str, pd.DataFrame]]]]
+
+class ResponseTiming(NamedTuple):
+    """Latency of one answer, in seconds from the start of the request."""
+    time_to_first_token: Optional[float]  # None when nothing was generated
+    total: float
+    cached: bool
 
-# Load environment variables (API KEY)
-load_dotenv()
 
 class QueryHandler:
-    def __init__(self):
-        self.llm: ChatOpenAI = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.5,
+    def __init__(self, model: str = "gpt-4o", temperature: float = 0.5, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 use_cache: bool = True, semantic_cache: bool = False, history_budget: int = DEFAULT_HISTORY_BUDGET,
+                 response_cache: Optional[ResponseCache] = None,
+                 context_builder: Optional[TableContextBuilder] = None,
+                 retriever: Optional[DocumentRetriever] = None):
+        """use_cache reuses earlier answers to the same question about the same content;
+        semantic_cache also matches differently worded questions by embedding similarity.
+        response_cache, context_builder and retriever share one cache, table profiles
+        and document indexes between handlers instead of creating their own.
+        history_budget caps the tokens of conversation history sent with each prompt."""
+        self.model: str = model
+        self.temperature: float = temperature
+        self.response_cache: Optional[ResponseCache] = None
+        if use_cache and response_cache is not None:
+            self.response_cache = response_cache
+        elif use_cache:
+            embedder = (lambda text: get_embeddings().embed_query(text)) if semantic_cache else None
+            self.response_cache = ResponseCache(embedder=embedder)
+        # Builds table context (full table or profile) within token_budget tokens
+        self.context_builder: TableContextBuilder = (
+            context_builder or TableContextBuilder(token_budget=token_budget, model=model)
         )
-        self.history: List[str] = []  # List to store the history of questions and answers
+        # Documents longer than the token budget are represented by their most relevant chunks
+        self.retriever: DocumentRetriever = retriever or DocumentRetriever()
+        self.retrieval_k: int = DEFAULT_TOP_K
+        # Recent questions and answers, with older turns compressed into a summary
+        self.memory: ConversationMemory = ConversationMemory(token_budget=history_budget, model=model)
+        self.prompt_metrics: "deque[PromptMetrics]" = deque(maxlen=1000)  # Token counts per prompt sent
+        self.last_timing: Optional[ResponseTiming] = None  # Latency of the most recent answer
+        self.last_stage_timings: Dict[str, float] = {}  # Per-stage seconds of the most recent query
+
+    @property
+    def history(self) -> List[str]:
+        """The turns of the conversation kept verbatim, oldest first."""
+        return [turn.text for turn in self.memory.turns]
+
+    @property
+    def llm(self) -> "ChatOpenAI":
+        """The shared chat client, created on first use."""
+        return get_llm(model=self.model, temperature=self.temperature)
 
-    def ask_question(self, content: Union[pd.DataFrame, str], question: str) -> str:
+    def ask_question(self, content: Content, question: str) -> str:
         """
         Ask a question using LangChain, with context from previous questions and answers.
 
         Args:
-            content (Union[pd.DataFrame, str]): The content to base the answer on.
-                Can be either a DataFrame or a string (comparison summary).
+            content (Content): The content to base the answer on.
+                Can be a DataFrame, the named DataFrames of one file, or a string (comparison summary).
+            question (str): The question to be answered.
+
+        Returns:
+            str: The generated answer to the question.
+        """
+        return self._answer(question, self._format_content(content, question))
+
+    def stream_question(self, content: Content, question: str,
+                        compute: Optional[ComputeResult] = None) -> Iterator[str]:
+        """
+        Like ask_question, but yield the answer in chunks as the LLM produces them.
+
+        The history (and response cache) are updated once the iterator is exhausted.
+
+        Args:
+            content (Content): The content to base the answer on.
+            question (str): The question to be answered.
+            compute (ComputeResult, optional): Computes the answer's data locally on a cache miss;
+                its result replaces the content in the prompt. Cached under the content either way.
+
+        Returns:
+            Iterator[str]: The chunks of the answer.
+        """
+        return self._stream_answer(question, self._format_content(content, question), compute)
+
+    async def astream_question(self, content: Content, question: str,
+                               compute: Optional[AsyncComputeResult] = None) -> AsyncIterator[str]:
+        """Like stream_question, but as an async iterator with an async compute; cancelling it
+        cancels the LLM requests, including those of compute and of summarizing the history."""
+        content_str = await asyncio.to_thread(self._format_content, content, question)
+        async for chunk in self._astream_answer(question, content_str, compute):
+            yield chunk
+
+    def ask_with_result(self, question: str, language: str, query: str, result: pd.DataFrame) -> str:
+        """
+        Answer a question from the result of a query that was computed locally over the loaded tables.
+
+        Args:
             question (str): The question to be answered.
+            language (str): The language the query was written in ("sql" or "pandas").
+            query (str): The query that produced the result.
+            result (pd.DataFrame): The computed result the answer is based on.
 
         Returns:
             str: The generated answer to the question.
         """
-        prompt = self._create_prompt(content, question)
-        answer = self._generate_response(prompt)
-        self._update_history(question, answer)
+        return self._answer(question, self._format_result(language, query, result))
+
+    def stream_with_result(self, question: str, language: str, query: str, result: pd.DataFrame) -> Iterator[str]:
+        """Like ask_with_result, but yield the answer in chunks as the LLM produces them."""
+        return self._stream_answer(question, self._format_result(language, query, result))
+
+    async def astream_with_result(self, question: str, language: str, query: str,
+                                  result: pd.DataFrame) -> AsyncIterator[str]:
+        """Like stream_with_result, but as an async iterator; cancelling it cancels the LLM request."""
+        content_str = await asyncio.to_thread(self._format_result, language, query, result)
+        async for chunk in self._astream_answer(question, content_str):
+            yield chunk
+
+    def _answer(self, question: str, content_str: str) -> str:
+        """Generate the whole answer and return the latest exchange for display."""
+        for _ in self._stream_answer(question, content_str):
+            pass
         return self.display_full_conversation()
 
-    def _create_prompt(self, content: Union[pd.DataFrame, str], question: str) -> str:
+    def _stream_answer(self, question: str, content_str: str,
+                       compute: Optional[ComputeResult] = None) -> Iterator[str]:
+        """Yield the answer from the response cache if possible, otherwise from the LLM as it streams.
+
+        The cache is checked before compute runs, so a repeated question costs no LLM call at all.
+        The exchange is recorded, and the timing stored in last_timing, once the answer is complete.
+        """
+        start = time.perf_counter()
+        history_str = self.memory.render()
+        cached = self._cached_answer(question, content_str, history_str)
+        if cached is not None:
+            chunks = iter([cached])
+        else:
+            prompt_content = self._computed_content(question, content_str, compute)
+            chunks = self._stream_response(self._build_prompt(question, prompt_content, history_str))
+
+        first_token = None
+        parts: List[str] = []
+        for chunk in chunks:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            parts.append(chunk)
+            yield chunk
+        self._finish_answer(question, content_str, history_str, parts, cached is not None, start, first_token)
+
+    async def _astream_answer(self, question: str, content_str: str,
+                              compute: Optional[AsyncComputeResult] = None) -> AsyncIterator[str]:
+        """Async counterpart of _stream_answer; blocking cache reads and writes run in worker threads."""
+        start = time.perf_counter()
+        history_str = self.memory.render()
+        cached = await asyncio.to_thread(self._cached_answer, question, content_str, history_str)
+
+        first_token = None
+        parts: List[str] = []
+        if cached is not None:
+            first_token = time.perf_counter() - start
+            parts.append(cached)
+            yield cached
+        else:
+            result = await compute(question) if compute is not None else None
+            prompt_content = self._format_result(*result) if result is not None else content_str
+            prompt = self._build_prompt(question, prompt_content, history_str)
+            async for chunk in self._astream_response(prompt):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(chunk)
+                yield chunk
+        answer = await asyncio.to_thread(
+            self._store_answer, question, content_str, history_str, parts, cached is not None, start, first_token
+        )
+        await self.memory.aadd(question, answer, content_str)
+
+    def _cached_answer(self, question: str, content_str: str, history_str: str) -> Optional[str]:
+        """The cached answer to the question about this content after this history, if any."""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(
+            question, content_str, llm_identity(self.model), self.temperature, history=history_str
+        )
+
+    def _computed_content(self, question: str, content_str: str, compute: Optional[ComputeResult]) -> str:
+        """The locally computed result as the prompt's content block, or content_str when there is none."""
+        result = compute(question) if compute is not None else None
+        return self._format_result(*result) if result is not None else content_str
+
+    def _build_prompt(self, question: str, content_str: str, history_str: str) -> str:
+        """The prompt to send, recording its token counts."""
+        self.prompt_metrics.append(PromptMetrics(
+            history_tokens=self.memory.tokens,
+            content_tokens=count_tokens(content_str, self.model),
+            question_tokens=count_tokens(question, self.model),
+        ))
+        return f"{history_str}\n{content_str}Question: {question}\nAnswer:"
+
+    def _finish_answer(self, question: str, content_str: str, history_str: str, parts: List[str], cached: bool,
+                       start: float, first_token: Optional[float]) -> None:
+        """Record the timing of a complete answer, cache it and add it to the history."""
+        answer = self._store_answer(question, content_str, history_str, parts, cached, start, first_token)
+        self._update_history(question, answer, content_str)
+
+    def _store_answer(self, question: str, content_str: str, history_str: str, parts: List[str], cached: bool,
+                      start: float, first_token: Optional[float]) -> str:
+        """Record the timing of a complete answer and cache it; returns the answer."""
+        answer = "".join(parts).strip()
+        self.last_timing = ResponseTiming(first_token, time.perf_counter() - start, cached)
+        if not cached and self.response_cache is not None and answer:
+            self.response_cache.put(
+                question, content_str, llm_identity(self.model), self.temperature, answer, history=history_str
+            )
+        return answer
+
+    def _create_prompt(self, content: Content, question: str) -> str:
         """
         Create a prompt based on the content type, question, and conversation history.
 
         Args:
-            content (Union[pd.DataFrame, str]): The content to base the answer on.
+            content (Content): The content to base the answer on.
             question (str): The question to be answered.
 
         Returns:
             str: The generated prompt.
         """
-        if isinstance(content, pd.DataFrame):
-            content_str = content.head(250).to_string(index=False)
-            content_str = f"DataFrame content:\n{content_str}\n\n"
-        else:
-            content_str = f"Comparison Summary:\n{content}\n\n"
-        
+        content_str = self._format_content(content, question)
+
         # Combine history into prompt, only including the latest context
-        history_str = "\n\n".join(self.history)
+        history_str = self.memory.render()
         return f"{history_str}\n{content_str}Question: {question}\nAnswer:"
 
+    def _format_content(self, content: Content, question: str) -> str:
+        """Render the content block of the prompt: table or document context, or the comparison summary.
+
+        Several named frames (the tables of one file) share the token budget equally.
+        """
+        if isinstance(content, dict):
+            budget = self.context_builder.token_budget // max(len(content), 1)
+            blocks = [f"Table {name}:\n{self._format_frame(df, question, budget)}" for name, df in content.items()]
+            return "File content:\n" + "\n\n".join(blocks) + "\n\n"
+        if isinstance(content, pd.DataFrame):
+            if self._is_document(content):
+                return f"Document content:\n{self._format_frame(content, question)}\n\n"
+            content_str = self.context_builder.build(content)
+            return f"DataFrame content:\n{content_str}\n\n"
+        return f"Comparison Summary:\n{content}\n\n"
+
+    @staticmethod
+    def _is_document(df: pd.DataFrame) -> bool:
+        """True for the one-cell Content frame PDF and DOCX files are loaded as."""
+        return 'Content' in df.columns and len(df) == 1
+
+    def _format_frame(self, df: pd.DataFrame, question: str, token_budget: Optional[int] = None) -> str:
+        """Context for one frame; a document too long for the budget is cut down to its relevant chunks."""
+        budget = self.context_builder.token_budget if token_budget is None else token_budget
+        if not self._is_document(df):
+            return self.context_builder.build(df, budget)
+        text = str(df['Content'].iloc[0])
+        if count_tokens(text, self.model) <= budget:
+            return text
+        chunks = self.retriever.retrieve(text, question, self.retrieval_k)
+        excerpts = [f"[Excerpt {number + 1}]\n{chunk}" for number, chunk in chunks]
+        return self.context_builder.truncate(
+            "Excerpts most relevant to the question, in document order:\n" + "\n\n".join(excerpts), budget
+        )
+
+    def _format_result(self, language: str, query: str, result: pd.DataFrame) -> str:
+        """Render a locally computed query result as the content block of the prompt."""
+        return (
+            f"The following result was computed exactly over the full data with this {language} query:\n"
+            f"{query}\n\nResult:\n{self.context_builder.build(result)}\n\n"
+        )
+
     def _generate_response(self, prompt: str) -> str:
         """
         Generate a response using the LLM based on the given prompt.
@@ -62,22 +299,45 @@ class QueryHandler:
         Returns:
             str: The generated response.
         """
-        response = self.llm.stream([prompt])
-        answer = "".join(chunk.content for chunk in response)
-        return answer.strip()
+        return "".join(self._stream_response(prompt)).strip()
+
+    def _stream_response(self, prompt: str) -> Iterator[str]:
+        """
+        Yield the text of the LLM's response to the prompt as it arrives.
+
+        Args:
+            prompt (str): The prompt to generate a response for.
+
+        Returns:
+            Iterator[str]: The non-empty chunks of the response.
+        """
+        for chunk in self.llm.stream([prompt]):
+            if chunk.content:
+                yield chunk.content
+
+    async def _astream_response(self, prompt: str) -> AsyncIterator[str]:
+        """Async counterpart of _stream_response."""
+        async for chunk in self.llm.astream([prompt]):
+            if chunk.content:
+                yield chunk.content
 
-    def _update_history(self, question: str, answer: str) -> None:
+    def _update_history(self, question: str, answer: str, content_str: str = "") -> None:
         """
         Update the conversation history with the latest question and answer.
 
+        Older turns are summarized once the history outgrows its token budget.
+
         Args:
             question (str): The question asked.
             answer (str): The answer received.
+            content_str (str): The content block the question was asked against.
         """
-        self.history.append(f"Question: {question}\n\nAnswer: {answer}\n")
-        # Optional: Limit history length to prevent excessive data accumulation
-        if len(self.history) > 10:  # Adjust as needed
-            self.history.pop(0)  # Remove the oldest entry
+        self.memory.add(question, answer, content_str)
+
+    @property
+    def last_prompt_metrics(self) -> Optional[PromptMetrics]:
+        """Token counts of the most recent prompt sent to the LLM."""
+        return self.prompt_metrics[-1] if self.prompt_metrics else None
 
     def display_full_conversation(self) -> str:
         """
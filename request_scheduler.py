@@ -0,0 +1,123 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional, Set
+
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_TIMEOUT_SECONDS = 120.0
+# How often a running request checks its stop event
+STOP_POLL_SECONDS = 0.1
+
+ChunkCallback = Callable[[str], None]
+DoneCallback = Callable[[Optional[BaseException]], None]
+
+
+class RequestScheduler:
+    """Runs streaming requests on an asyncio event loop in a dedicated thread.
+
+    At most max_concurrent requests run at once; the rest wait their turn. A request
+    is cancelled when its stop event is set, when it exceeds its timeout, or through
+    the future returned by submit(). Cancelling interrupts the request at its current
+    await, so an in-flight LLM call is abandoned rather than run to completion.
+    Callbacks run on the loop thread; GUI code should only hand their data over to
+    its own thread (e.g. through a queue polled with after()).
+    """
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, timeout: float = DEFAULT_TIMEOUT_SECONDS):
+        self.max_concurrent: int = max_concurrent
+        self.timeout: float = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._futures: Set[concurrent.futures.Future] = set()
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="request-scheduler", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(
+        self,
+        make_stream: Callable[[], AsyncIterator[str]],
+        on_chunk: ChunkCallback,
+        on_done: DoneCallback,
+        stop_event: Optional[threading.Event] = None,
+        timeout: Optional[float] = None,
+    ) -> concurrent.futures.Future:
+        """Schedule a streaming request and return a future that can cancel it.
+
+        make_stream is called on the loop thread to create the async iterator. Every
+        chunk is passed to on_chunk; on_done is called once at the end with None, the
+        exception the request raised, asyncio.TimeoutError or asyncio.CancelledError.
+        """
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(make_stream, on_chunk, on_done, stop_event, self.timeout if timeout is None else timeout),
+            loop,
+        )
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    async def _run(self, make_stream: Callable[[], AsyncIterator[str]], on_chunk: ChunkCallback,
+                   on_done: DoneCallback, stop_event: Optional[threading.Event], timeout: float) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)  # Created on the loop it belongs to
+        error: Optional[BaseException] = None
+        try:
+            async with self._semaphore:
+                task = asyncio.ensure_future(self._consume(make_stream(), on_chunk))
+                deadline = time.monotonic() + timeout
+                try:
+                    while not task.done():
+                        await asyncio.wait({task}, timeout=STOP_POLL_SECONDS)
+                        if task.done():
+                            break
+                        if stop_event is not None and stop_event.is_set():
+                            task.cancel()
+                            error = asyncio.CancelledError()
+                        elif time.monotonic() > deadline:
+                            task.cancel()
+                            error = asyncio.TimeoutError(f"No complete response within {timeout:g} seconds.")
+                finally:
+                    if not task.done():  # The request itself was cancelled through its future
+                        task.cancel()
+                        error = asyncio.CancelledError()
+                if error is None and not task.cancelled():
+                    error = task.exception()
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        finally:
+            on_done(error)
+
+    @staticmethod
+    async def _consume(stream: AsyncIterator[str], on_chunk: ChunkCallback) -> None:
+        async for chunk in stream:
+            on_chunk(chunk)
+
+    def cancel_all(self) -> None:
+        """Cancel every pending and running request."""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+
+    def shutdown(self) -> None:
+        """Cancel outstanding requests and stop the event loop thread."""
+        self.cancel_all()
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = self._semaphore = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=1.0)
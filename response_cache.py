@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from parse_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("AI_ASSISTANT_RESPONSE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = 1000
+# Cosine similarity above which a differently worded question counts as the same question
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+CACHE_FILE_NAME = "responses.json"
+VECTORS_FILE_NAME = "vectors.npz"  # Question embeddings of the semantic tier, by entry key
+
+Embedder = Callable[[str], Sequence[float]]
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case a question and collapse whitespace and trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def content_hash(content: str) -> str:
+    """Hash of the context text a question is asked against."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """Cache of LLM answers, persisted as JSON in the cache directory.
+
+    An answer is keyed on the normalized question, a hash of the content it was asked
+    against, a hash of the conversation history it followed, the model and the
+    temperature. Exact matches are looked up by key; with an embedder, a question
+    about the same content and history whose embedding is close enough to a cached
+    one is also a hit. Embeddings are stored next to the JSON in a .npz file.
+    Entries expire after ttl_seconds and the least recently used ones are dropped
+    beyond max_entries.
+    """
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    ):
+        self.path: str = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "responses", CACHE_FILE_NAME)
+        self.vectors_path: str = os.path.join(os.path.dirname(self.path), VECTORS_FILE_NAME)
+        self.ttl_seconds: float = ttl_seconds
+        self.max_entries: int = max_entries
+        self.embedder: Optional[Embedder] = embedder
+        self.similarity_threshold: float = similarity_threshold
+        self._entries: Optional["OrderedDict[str, Dict]"] = None  # Read from disk on first use
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._vectors_changed = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def key(cls, question: str, content: str, model: str, temperature: float, history: str = "") -> str:
+        """Fingerprint of (normalized question, content and history hashes, model, temperature)."""
+        identity = f"{normalize_question(question)}|{cls._scope(content, model, temperature, history)}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, content: str, model: str, temperature: float, history: str = "") -> Optional[str]:
+        """Return the cached answer for the question, or None on a miss.
+
+        history is the conversation the question follows; a follow-up question only
+        matches answers given after the same history.
+        """
+        key = self.key(question, content, model, temperature, history)
+        with self._lock:
+            entries = self._load()
+            self._expire(entries)
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                return entry["answer"]
+            if self.embedder is None:
+                return None
+
+        # Embedding is a network call for most embedders, so it runs outside the lock
+        vector = self._embed(question)
+        if vector is None:
+            return None
+        scope = self._scope(content, model, temperature, history)
+        with self._lock:
+            candidates = [
+                (k, e) for k, e in self._load().items()
+                if e["scope"] == scope and k in self._vectors
+            ]
+            if not candidates:
+                return None
+            matrix = np.stack([self._vectors[k] for k, _ in candidates])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+            best_key, best_entry = candidates[best]
+            self._entries.move_to_end(best_key)
+            return best_entry["answer"]
+
+    def put(self, question: str, content: str, model: str, temperature: float, answer: str,
+            history: str = "") -> None:
+        """Store an answer and write the cache to disk."""
+        key = self.key(question, content, model, temperature, history)
+        vector = self._embed(question) if self.embedder is not None else None
+        with self._lock:
+            entries = self._load()
+            entries[key] = {
+                "scope": self._scope(content, model, temperature, history),
+                "answer": answer,
+                "created": time.time(),
+            }
+            if vector is not None:
+                self._vectors[key] = vector
+                self._vectors_changed = True
+            entries.move_to_end(key)
+            self._expire(entries)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._save(entries)
+
+    def clear(self) -> None:
+        """Remove every cached answer."""
+        with self._lock:
+            self._entries = OrderedDict()
+            self._vectors = {}
+            for path in (self.path, self.vectors_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _scope(content: str, model: str, temperature: float, history: str = "") -> str:
+        # Similar questions only match answers about the same content, after the same
+        # conversation, from the same model settings
+        return f"{content_hash(content)}|{content_hash(history)}|{model}|{float(temperature)!r}"
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of the normalized question, or None if the embedder fails."""
+        try:
+            vector = np.asarray(self.embedder(normalize_question(question)), dtype=np.float32)
+        except Exception as e:
+            print(f"Could not embed question for the response cache: {str(e)}")
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _expire(self, entries: "OrderedDict[str, Dict]") -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for key in [k for k, e in entries.items() if e["created"] < cutoff]:
+            del entries[key]
+
+    def _load(self) -> "OrderedDict[str, Dict]":
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as cache_file:
+                    self._entries = OrderedDict(json.load(cache_file))  # Stored in LRU order
+            except (OSError, ValueError):
+                self._entries = OrderedDict()
+            try:
+                with np.load(self.vectors_path) as stored:
+                    self._vectors = dict(zip(stored["keys"].tolist(), stored["vectors"]))
+            except (OSError, ValueError, KeyError):
+                self._vectors = {}
+        return self._entries
+
+    def _save(self, entries: "OrderedDict[str, Dict]") -> None:
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as cache_file:
+                json.dump(list(entries.items()), cache_file)
+            os.replace(tmp_path, self.path)  # Atomic, so a crash never leaves a partial file
+            if self._vectors_changed or len(self._vectors) > len(entries):
+                self._save_vectors(entries, directory)
+        except OSError as e:
+            print(f"Could not save the response cache: {str(e)}")
+
+    def _save_vectors(self, entries: "OrderedDict[str, Dict]", directory: str) -> None:
+        """Write the embeddings of the current entries; only needed when the semantic tier added or lost some."""
+        self._vectors = {key: vector for key, vector in self._vectors.items() if key in entries}
+        keys = list(self._vectors)
+        vectors = np.stack([self._vectors[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".npz", dir=directory)
+        with os.fdopen(fd, "wb") as vectors_file:
+            np.savez(vectors_file, keys=np.array(keys, dtype=str), vectors=vectors)
+        os.replace(tmp_path, self.vectors_path)
+        self._vectors_changed = False
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from parse_cache import DEFAULT_CACHE_DIR, evict_least_recently_used
+
+# Bump when chunking or the embedder changes so persisted indexes are rebuilt
+INDEX_VERSION = 1
+CHUNK_WORDS = 200
+CHUNK_OVERLAP_WORDS = 40
+DEFAULT_TOP_K = 6
+EMBEDDING_DIM = 512
+# Size bound of the persisted indexes, like the parse cache's
+DEFAULT_MAX_INDEX_BYTES = int(os.environ.get("AI_ASSISTANT_RETRIEVAL_MAX_BYTES", 512 * 1024 ** 2))
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Reciprocal rank fusion constant; larger values flatten the difference between ranks
+RRF_K = 60
+
+WORD_PATTERN = re.compile(r"\w+")
+
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS) -> List[str]:
+    """Split text into chunks of about chunk_words words, each overlapping the previous one.
+
+    Line breaks inside a chunk are kept, so tables and lists stay readable.
+    """
+    words = re.findall(r"\S+\s*", text)
+    if not words:
+        return []
+    step = max(chunk_words - overlap_words, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append("".join(words[start:start + chunk_words]).strip())
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: words and word pairs hashed into a fixed-size signed vector.
+
+    Needs no model or network, so indexes can be built offline; similar wording gives
+    similar vectors, which complements BM25's exact term matching.
+    """
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim: int = dim
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vectors[row, value % self.dim] += 1.0 if value >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class DocumentIndex:
+    """BM25 and embedding index over the chunks of one document."""
+    def __init__(self, chunks: List[str], embeddings: np.ndarray):
+        self.chunks: List[str] = chunks
+        self.embeddings: np.ndarray = embeddings
+        self._term_counts: List[Counter] = [Counter(tokenize(chunk)) for chunk in chunks]
+        self._lengths = np.array([sum(counts.values()) for counts in self._term_counts], dtype=np.float64)
+        self._document_frequency: Counter = Counter()
+        for counts in self._term_counts:
+            self._document_frequency.update(counts.keys())
+
+    def bm25(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for the query."""
+        scores = np.zeros(len(self.chunks))
+        if not self.chunks:
+            return scores
+        average_length = self._lengths.mean() or 1.0
+        for term in set(tokenize(query)):
+            frequency = self._document_frequency.get(term)
+            if not frequency:
+                continue
+            idf = np.log(1 + (len(self.chunks) - frequency + 0.5) / (frequency + 0.5))
+            tf = np.array([counts.get(term, 0) for counts in self._term_counts], dtype=np.float64)
+            scores += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths / average_length))
+        return scores
+
+    def search(self, query: str, query_embedding: Optional[np.ndarray], k: int = DEFAULT_TOP_K) -> List[int]:
+        """Indexes of the k most relevant chunks, fusing BM25 and embedding ranks, in document order."""
+        if not self.chunks:
+            return []
+        rankings = [np.argsort(-self.bm25(query), kind="stable")]
+        if query_embedding is not None and len(self.embeddings):
+            rankings.append(np.argsort(-(self.embeddings @ query_embedding), kind="stable"))
+        fused = np.zeros(len(self.chunks))
+        for ranking in rankings:
+            fused[ranking] += 1.0 / (RRF_K + np.arange(1, len(ranking) + 1))
+        top = np.argsort(-fused, kind="stable")[:k]
+        return sorted(int(i) for i in top)
+
+
+class DocumentRetriever:
+    """Builds, persists and queries chunk indexes for document text.
+
+    Indexes are keyed by a hash of the text and stored in the cache directory
+    (chunks as JSON, embeddings as .npy), so a document is chunked and embedded
+    once across sessions. The least recently used indexes are removed once the
+    directory grows past max_bytes.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, embedder: Optional[Embedder] = None,
+                 chunk_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS,
+                 max_bytes: int = DEFAULT_MAX_INDEX_BYTES):
+        self.cache_dir: str = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "retrieval")
+        self.max_bytes: int = max_bytes
+        self.embedder: Embedder = embedder or HashingEmbedder()
+        self.chunk_words: int = chunk_words
+        self.overlap_words: int = overlap_words
+        self._indexes: Dict[str, DocumentIndex] = {}
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> str:
+        identity = f"{INDEX_VERSION}|{self.chunk_words}|{self.overlap_words}|{getattr(self.embedder, 'dim', '')}|"
+        return hashlib.sha256(identity.encode("utf-8") + text.encode("utf-8")).hexdigest()
+
+    def index(self, text: str) -> DocumentIndex:
+        """Return the index for text, loading it from disk or building it on first use."""
+        key = self.key(text)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        index = self._load(key)
+        if index is None:
+            chunks = chunk_text(text, self.chunk_words, self.overlap_words)
+            embeddings = self.embedder(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+            index = DocumentIndex(chunks, np.asarray(embeddings, dtype=np.float32))
+            self._save(key, index)
+        with self._lock:
+            self._indexes[key] = index
+        return index
+
+    def retrieve(self, text: str, query: str, k: int = DEFAULT_TOP_K) -> List[Tuple[int, str]]:
+        """The k chunks of text most relevant to query, as (chunk number, chunk) in document order."""
+        index = self.index(text)
+        query_embedding = self.embedder([query])[0] if index.chunks else None
+        return [(i, index.chunks[i]) for i in index.search(query, query_embedding, k)]
+
+    def _load(self, key: str) -> Optional[DocumentIndex]:
+        chunks_path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(chunks_path, "r", encoding="utf-8") as chunks_file:
+                chunks = json.load(chunks_file)
+            embeddings = np.load(os.path.join(self.cache_dir, f"{key}.npy"), mmap_mode="r")
+            os.utime(chunks_path)  # Mark the index as recently used
+        except (OSError, ValueError):
+            return None
+        return DocumentIndex(chunks, embeddings)
+
+    def _save(self, key: str, index: DocumentIndex) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # The chunks file is written last, so a present chunks file means a complete entry
+            np.save(os.path.join(self.cache_dir, f"{key}.npy"), index.embeddings)
+            tmp_path = os.path.join(self.cache_dir, f".tmp-{key}.json")
+            with open(tmp_path, "w", encoding="utf-8") as chunks_file:
+                json.dump(index.chunks, chunks_file)
+            os.replace(tmp_path, os.path.join(self.cache_dir, f"{key}.json"))
+        except OSError as e:
+            print(f"Could not save the retrieval index: {str(e)}")
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used indexes until the directory fits in max_bytes."""
+        sizes: Dict[str, int] = {}
+        last_used: Dict[str, float] = {}
+        try:
+            files = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in files:
+            key, extension = os.path.splitext(entry.name)
+            if key.startswith(".tmp-") or extension not in (".json", ".npy"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            sizes[key] = sizes.get(key, 0) + stat.st_size
+            if extension == ".json":  # Touched on every load
+                last_used[key] = stat.st_mtime
+        entries = [(last_used.get(key, 0.0), size, key) for key, size in sizes.items()]
+        evict_least_recently_used(entries, self.max_bytes, self._remove)
+
+    def _remove(self, key: str) -> None:
+        # The chunks file goes first, so a half-removed index is never loaded
+        for extension in (".json", ".npy"):
+            try:
+                os.remove(os.path.join(self.cache_dir, f"{key}{extension}"))
+            except OSError:
+                pass  # Still memory-mapped on Windows; removed by a later eviction
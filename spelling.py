@@ -0,0 +1,90 @@
+import re
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Set
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from spellchecker import SpellChecker
+
+TOKEN_CACHE_SIZE = 4096
+# Leading punctuation, the word itself, trailing punctuation
+TOKEN_PATTERN = re.compile(r"^(\W*)(.*?)(\W*)$")
+VOCABULARY_WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z']+")
+# Distinct values taken from each text column, and the longest value taken; longer
+# values are free text (descriptions, documents) rather than names
+MAX_VALUES_PER_COLUMN = 5000
+MAX_VALUE_LENGTH = 100
+
+
+def vocabulary_from_frames(frames: Iterable[pd.DataFrame]) -> Set[str]:
+    """Words from column names, categorical values and text values, which must never be "corrected".
+
+    Text columns contribute their first MAX_VALUES_PER_COLUMN distinct values, so
+    names in high-cardinality columns (countries, products) are protected too.
+    """
+    words: Set[str] = set()
+    for df in frames:
+        for col in df.columns:
+            words.update(w.lower() for w in VOCABULARY_WORD_PATTERN.findall(str(col)))
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                values = df[col].cat.categories
+            elif pd.api.types.is_object_dtype(df[col].dtype) or pd.api.types.is_string_dtype(df[col].dtype):
+                values = df[col].dropna().unique()[:MAX_VALUES_PER_COLUMN]
+            else:
+                continue
+            for value in values:
+                if isinstance(value, str) and len(value) <= MAX_VALUE_LENGTH:
+                    words.update(w.lower() for w in VOCABULARY_WORD_PATTERN.findall(value))
+    return words
+
+
+class QuestionSpellChecker:
+    """Corrects misspelled words in questions, leaving domain vocabulary alone.
+
+    The word-frequency dictionary is loaded once, on first use. Only words the
+    dictionary does not know, and that are not protected, are corrected; each
+    correction is memoized. Acronyms and words containing digits or other non-letters
+    (ids, dates, snake_case column names) are left as they are.
+    """
+    def __init__(self, cache_size: int = TOKEN_CACHE_SIZE):
+        self._checker: Optional["SpellChecker"] = None
+        self._lock = threading.Lock()
+        self.protected: Set[str] = set()
+        self._correct = lru_cache(maxsize=cache_size)(self._correction)
+
+    @property
+    def checker(self) -> "SpellChecker":
+        with self._lock:
+            if self._checker is None:
+                from spellchecker import SpellChecker
+                self._checker = SpellChecker()
+            return self._checker
+
+    def protect(self, words: Iterable[str]) -> None:
+        """Replace the protected vocabulary (stored lower-case)."""
+        self.protected = {word.lower() for word in words}
+
+    def correct(self, text: str) -> str:
+        """Return text with misspelled words corrected and whitespace collapsed."""
+        parts = [TOKEN_PATTERN.match(token).groups() for token in text.split()]
+        candidates = {
+            word.lower() for _, word, _ in parts
+            if word.isalpha() and not word.isupper() and word.lower() not in self.protected
+        }
+        unknown = self.checker.unknown(candidates) if candidates else set()
+
+        tokens = []
+        for prefix, word, suffix in parts:
+            if word.lower() in unknown:
+                word = self._correct(word.lower()) or word
+            tokens.append(f"{prefix}{word}{suffix}")
+        return " ".join(tokens)
+
+    def _correction(self, word: str) -> Optional[str]:
+        return self.checker.correction(word)
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self._correct.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
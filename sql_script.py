@@ -0,0 +1,126 @@
+import re
+from typing import Iterator, List, Sequence
+
+import sqlalchemy
+
+# Quoted strings and identifiers, comments, and statement separators. Anything else
+# is plain SQL text and is skipped over by the regex engine.
+SQL_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*'"          # 'string literal' with '' escapes
+    r'|"(?:[^"]|"")*"'         # "quoted identifier"
+    r"|`[^`]*`"                # `MySQL identifier`
+    r"|--[^\n]*"               # -- line comment
+    r"|/\*.*?\*/"              # /* block comment */
+    r"|;",
+    re.DOTALL,
+)
+
+# Keywords opening and closing blocks (trigger bodies, CASE expressions) whose semicolons
+# do not end the statement
+BLOCK_KEYWORD_PATTERN = re.compile(r"\b(BEGIN|CASE|END)\b", re.IGNORECASE)
+
+# Transaction control in dumps (e.g. sqlite3 .dump output); transactions are managed here instead
+TRANSACTION_CONTROL_PATTERN = re.compile(r"^(BEGIN|COMMIT|END|ROLLBACK)(\s+TRANSACTION)?$", re.IGNORECASE)
+
+# Statements per transaction when bulk loading into SQLite
+BATCH_SIZE = 5000
+# Trade durability for speed; the target is a scratch in-memory database
+SQLITE_BULK_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+)
+
+
+def split_sql_statements(script: str) -> List[str]:
+    """Split a SQL script into statements on top-level semicolons.
+
+    Semicolons inside string literals, quoted identifiers, comments and BEGIN ... END
+    blocks (e.g. trigger bodies) do not end a statement. Comments are dropped and
+    empty statements are skipped.
+    """
+    statements: List[str] = []
+    pieces: List[str] = []
+    position = 0
+    depth = 0  # Open BEGIN/CASE blocks in the current statement
+    started = False  # Whether the current statement has any text yet
+    for match in SQL_TOKEN_PATTERN.finditer(script):
+        token = match.group()
+        text = script[position:match.start()]
+        if len(text) > 2:  # Shorter text, such as ", " between literals, holds no keyword
+            depth = _block_depth(text, depth, statement_start=not started)
+            started = started or not text.isspace()
+        elif text.strip():
+            started = True
+        pieces.append(text)
+        position = match.end()
+        if token == ";" and depth == 0:
+            statement = "".join(pieces).strip()
+            if statement:
+                statements.append(statement)
+            pieces = []
+            started = False
+        elif token.startswith("--") or token.startswith("/*"):
+            pieces.append(" ")
+        else:
+            pieces.append(token)
+            started = True
+    pieces.append(script[position:])
+    statement = "".join(pieces).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def _block_depth(text: str, depth: int, statement_start: bool) -> int:
+    """Block nesting after text. A BEGIN that opens the statement is transaction control, not a block."""
+    for match in BLOCK_KEYWORD_PATTERN.finditer(text):
+        keyword = match.group().upper()
+        if keyword == "END":
+            depth = max(depth - 1, 0)  # A bare END is also transaction control
+        elif keyword == "CASE" or not (statement_start and not text[:match.start()].strip()):
+            depth += 1
+    return depth
+
+
+def _batches(statements: Sequence[str], size: int) -> Iterator[Sequence[str]]:
+    for start in range(0, len(statements), size):
+        yield statements[start:start + size]
+
+
+def execute_sql_script(engine: sqlalchemy.engine.Engine, statements: Sequence[str], batch_size: int = BATCH_SIZE) -> None:
+    """Execute statements in explicit transactions, tuned for bulk loading.
+
+    On SQLite the statements run through the driver's executescript in batches of
+    batch_size per transaction, with pragmas that skip journaling and syncing.
+    Other databases run every statement in a single transaction. Statements are
+    passed to the driver as-is, so colons inside literals are not taken for bind
+    parameters.
+    """
+    statements = [s for s in statements if not TRANSACTION_CONTROL_PATTERN.match(s)]
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+        return
+
+    raw = engine.raw_connection()
+    try:
+        driver_connection = raw.driver_connection
+        for pragma in SQLITE_BULK_PRAGMAS:
+            driver_connection.execute(pragma)
+        for batch in _batches(statements, batch_size):
+            try:
+                driver_connection.executescript("BEGIN;\n" + ";\n".join(batch) + ";\nCOMMIT;")
+            except Exception:
+                if driver_connection.in_transaction:
+                    driver_connection.rollback()
+                raise
+    finally:
+        raw.close()
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for use in SQL."""
+    return '"' + name.replace('"', '""') + '"'
@@ -0,0 +1,182 @@
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from comparison import DataFrameFingerprint, FingerprintBuilder
+
+# Key under which a streamed table's profile travels in DataFrame.attrs
+PROFILE_ATTR = "table_profile"
+SAMPLE_ROW_COLUMN = "__row_number__"
+
+
+@dataclass
+class ColumnStats:
+    """Summary statistics for one column, accumulated chunk by chunk."""
+    name: str
+    dtype: str
+    numeric: bool
+    count: int = 0
+    nulls: int = 0
+    minimum: Any = None
+    maximum: Any = None
+    total: float = 0.0
+    total_sq: float = 0.0
+    value_counts: Counter = field(default_factory=Counter)
+    counts_truncated: bool = False
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.numeric and self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        if not self.numeric or self.count < 2:
+            return None
+        variance = (self.total_sq - self.total ** 2 / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def distinct(self) -> Optional[int]:
+        """Exact number of distinct values, or None when it was not tracked in full."""
+        if self.numeric or self.counts_truncated:
+            return None
+        return len(self.value_counts)
+
+    def top_values(self, k: int) -> List[Tuple[Any, int]]:
+        return self.value_counts.most_common(k)
+
+
+class TableProfile:
+    """One-pass profile of a table: row count, column statistics, top values, a row sample and hashes.
+
+    The profile is built by feeding it chunks, so a table can be summarized without
+    ever holding it in memory. The row sample is a uniform sample without replacement
+    (each row gets a random key and the rows with the smallest keys are kept).
+    """
+    def __init__(self, sample_size: int = 250, max_tracked_values: int = 1000, seed: int = 0,
+                 fingerprint: bool = True):
+        self.sample_size: int = sample_size
+        self.max_tracked_values: int = max_tracked_values
+        self.row_count: int = 0
+        self.columns: Dict[str, ColumnStats] = {}
+        self._rng = np.random.default_rng(seed)
+        self._sample: pd.DataFrame = pd.DataFrame()
+        self._sample_keys: np.ndarray = np.zeros(0)
+        self._fingerprint_builder: Optional[FingerprintBuilder] = (
+            FingerprintBuilder(keep_row_hashes=False) if fingerprint else None
+        )
+        self._fingerprint: Optional[DataFrameFingerprint] = None
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame], **kwargs) -> "TableProfile":
+        profile = cls(**kwargs)
+        for chunk in chunks:
+            profile.update(chunk)
+        return profile
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, **kwargs) -> "TableProfile":
+        profile = cls(**kwargs)
+        profile.update(df)
+        return profile
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Fold the next chunk of rows into the profile."""
+        if chunk.empty and self.columns:
+            return
+        for col in chunk.columns:
+            self._update_column(col, chunk[col])
+        if self.sample_size:
+            self._update_sample(chunk)
+        if self._fingerprint_builder is not None:
+            self._fingerprint_builder.update(chunk)
+        self.row_count += len(chunk)
+
+    def _update_column(self, name: str, series: pd.Series) -> None:
+        stats = self.columns.get(name)
+        is_numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        if stats is None:
+            stats = self.columns[name] = ColumnStats(name, str(series.dtype), is_numeric)
+        elif stats.numeric and not is_numeric and series.notna().any():
+            # Values of another type turned up in a later chunk; keep counting values instead
+            stats.numeric = False
+            stats.dtype = str(series.dtype)
+            stats.minimum = stats.maximum = None
+
+        non_null = series.dropna()
+        stats.count += len(non_null)
+        stats.nulls += len(series) - len(non_null)
+        if non_null.empty:
+            return
+
+        if stats.numeric:
+            values = non_null.to_numpy(dtype=np.float64)
+            low, high = values.min(), values.max()
+            stats.minimum = low if stats.minimum is None else min(stats.minimum, low)
+            stats.maximum = high if stats.maximum is None else max(stats.maximum, high)
+            stats.total += float(values.sum())
+            stats.total_sq += float(np.square(values).sum())
+        else:
+            stats.value_counts.update(non_null.value_counts().to_dict())
+            if len(stats.value_counts) > self.max_tracked_values:
+                # Keep only the heaviest hitters so memory stays bounded
+                stats.value_counts = Counter(dict(stats.value_counts.most_common(self.max_tracked_values)))
+                stats.counts_truncated = True
+
+    def _update_sample(self, chunk: pd.DataFrame) -> None:
+        keys = self._rng.random(len(chunk))
+        positions = np.arange(len(chunk))
+        if len(chunk) > self.sample_size:
+            positions = np.argsort(keys)[:self.sample_size]
+        candidates = chunk.iloc[positions].assign(**{SAMPLE_ROW_COLUMN: self.row_count + positions})
+        candidate_keys = keys[positions]
+
+        if len(self._sample):
+            candidates = pd.concat([self._sample, candidates], ignore_index=True)
+            candidate_keys = np.concatenate([self._sample_keys, candidate_keys])
+        if len(candidates) > self.sample_size:
+            keep = np.argsort(candidate_keys)[:self.sample_size]
+            candidates = candidates.iloc[keep]
+            candidate_keys = candidate_keys[keep]
+        self._sample = candidates.reset_index(drop=True)
+        self._sample_keys = candidate_keys
+
+    @property
+    def sample(self) -> pd.DataFrame:
+        """The row sample, in the order the rows appeared in the table."""
+        if self._sample.empty:
+            return pd.DataFrame(columns=list(self.columns))
+        return self._sample.sort_values(SAMPLE_ROW_COLUMN).drop(columns=SAMPLE_ROW_COLUMN).reset_index(drop=True)
+
+    def __deepcopy__(self, memo: dict) -> "TableProfile":
+        # pandas deep-copies attrs on most operations; the profile is shared instead
+        return self
+
+    def __getstate__(self) -> dict:
+        # Hash objects cannot be pickled, so a pickled profile keeps the finished fingerprint
+        state = self.__dict__.copy()
+        state["_fingerprint"] = self.fingerprint
+        state["_fingerprint_builder"] = None
+        return state
+
+    @property
+    def fingerprint(self) -> DataFrameFingerprint:
+        """Content hashes of everything seen so far (without per-row hashes); None if not hashed."""
+        if self._fingerprint_builder is None:
+            return self._fingerprint
+        return self._fingerprint_builder.build()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """The row sample as a DataFrame that carries this profile in its attrs."""
+        df = self.sample
+        df.attrs[PROFILE_ATTR] = self
+        return df
+
+
+def get_profile(df: pd.DataFrame) -> Optional[TableProfile]:
+    """Return the profile attached to a streamed table's sample frame, if any."""
+    return df.attrs.get(PROFILE_ATTR)
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep the parse, response and retrieval caches of the code under test out of the user's cache
+os.environ.setdefault("AI_ASSISTANT_CACHE_DIR", tempfile.mkdtemp(prefix="ai-assistant-tests-"))
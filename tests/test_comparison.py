@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from main import App
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def app():
+    app = App(load_workers=1, local_queries=False, voice=False)
+    yield app
+    app.shutdown()
+
+
+def test_csv_and_sql_script_are_compared(app):
+    csv_path = os.path.join(REPO_ROOT, "covid.csv")
+    sql_path = os.path.join(REPO_ROOT, "db 1 sql.sql")
+    assert app.load_files([csv_path, sql_path]) == "Files successfully loaded."
+    assert "Comparing covid.csv with db 1 sql.sql::mytable" in app.comparison_summary
+
+
+def test_same_named_tables_are_compared_only_across_files(app, tmp_path):
+    for name, value in (("a.sql", 1), ("b.sql", 2)):
+        (tmp_path / name).write_text(
+            f"CREATE TABLE t1 (x INTEGER); INSERT INTO t1 VALUES ({value});\n"
+            f"CREATE TABLE t2 (y TEXT); INSERT INTO t2 VALUES ('v{value}');\n",
+            encoding="utf-8",
+        )
+    app.load_files([str(tmp_path / "a.sql"), str(tmp_path / "b.sql")])
+    comparisons = [line for line in app.comparison_summary.splitlines() if line.startswith("Comparing")]
+    assert comparisons == ["Comparing a.sql::t1 with b.sql::t1:", "Comparing a.sql::t2 with b.sql::t2:"]
+
+
+def test_summary_is_never_empty_with_two_files(app):
+    app.load_files([os.path.join(REPO_ROOT, "db 1 sql.sql"), os.path.join(REPO_ROOT, "db 2.xlsx")])
+    assert app.comparison_summary
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from parse_cache import ParseCache
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(cache_dir=str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.csv"
+    path.write_text("placeholder", encoding="utf-8")
+    return str(path)
+
+
+def round_trip(cache, source, df):
+    assert cache.put(source, {"sheet": df})
+    return cache.get(source)["sheet"]
+
+
+def test_round_trip_keeps_frame_and_column_labels(cache, source):
+    df = pd.DataFrame({
+        "Country": pd.Series(["France", "Spain"], dtype="category"),
+        2019: [1, 2],
+        2020.5: [1.5, None],
+        "Total": [10, 20],
+    })
+    cached = round_trip(cache, source, df)
+    assert cached.equals(df)
+    assert list(cached.columns) == list(df.columns)
+    assert [type(label) for label in cached.columns] == [type(label) for label in df.columns]
+
+
+def test_unrestorable_labels_are_not_cached(cache, source):
+    df = pd.DataFrame([[1, 2]], columns=pd.MultiIndex.from_tuples([("a", 1), ("a", 2)]))
+    assert not cache.put(source, {"sheet": df})
+    assert cache.get(source) is None
@@ -0,0 +1,119 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import llm_client
+from llm_client import StubChatModel
+from query_handler import QueryHandler
+from response_cache import ResponseCache
+from retrieval import DocumentRetriever
+
+CONTENT = "Table covid: Country, Total_cases\n"
+
+
+class CountingStub(StubChatModel):
+    """StubChatModel that counts the answers it streams."""
+    calls = 0
+
+    def stream(self, prompt):
+        CountingStub.calls += 1
+        return super().stream(prompt)
+
+
+def fake_embedder(text):
+    """Deterministic embedding: questions with the same words get the same vector."""
+    vector = np.zeros(16, dtype=np.float32)
+    for word in text.lower().rstrip("?").split():
+        vector[sum(map(ord, word)) % 16] += 1.0
+    return vector
+
+
+@pytest.fixture
+def stub_llm():
+    CountingStub.calls = 0
+    llm_client.set_llm_factory(CountingStub)
+    yield
+    llm_client.set_llm_factory(None)
+
+
+@pytest.fixture
+def handler(tmp_path, stub_llm):
+    return QueryHandler(
+        response_cache=ResponseCache(cache_dir=str(tmp_path)),
+        retriever=DocumentRetriever(cache_dir=str(tmp_path)),
+    )
+
+
+def test_exact_hit_and_miss(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put("How many countries?", CONTENT, "gpt-4o", 0.5, "Three.")
+    assert cache.get("how many countries", CONTENT, "gpt-4o", 0.5) == "Three."
+    assert cache.get("How many countries?", CONTENT + "x", "gpt-4o", 0.5) is None
+    assert cache.get("How many countries?", CONTENT, "gpt-4o-mini", 0.5) is None
+    assert ResponseCache(cache_dir=str(tmp_path)).get("How many countries?", CONTENT, "gpt-4o", 0.5) == "Three."
+
+
+def test_history_is_part_of_the_key(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put("And for the second file?", CONTENT, "gpt-4o", 0.5, "Five.", history="Question: cases?")
+    assert cache.get("And for the second file?", CONTENT, "gpt-4o", 0.5, history="Question: cases?") == "Five."
+    assert cache.get("And for the second file?", CONTENT, "gpt-4o", 0.5, history="Question: deaths?") is None
+    assert cache.get("And for the second file?", CONTENT, "gpt-4o", 0.5) is None
+
+
+def test_expiry_and_size_bound(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), ttl_seconds=0)
+    cache.put("q", CONTENT, "gpt-4o", 0.5, "a")
+    assert cache.get("q", CONTENT, "gpt-4o", 0.5) is None
+
+    cache = ResponseCache(cache_dir=str(tmp_path), max_entries=2)
+    for n in range(3):
+        cache.put(f"q{n}", CONTENT, "gpt-4o", 0.5, f"a{n}")
+    assert cache.get("q0", CONTENT, "gpt-4o", 0.5) is None
+    assert cache.get("q2", CONTENT, "gpt-4o", 0.5) == "a2"
+
+
+def test_semantic_vectors_are_stored_outside_the_json(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), embedder=fake_embedder, similarity_threshold=0.99)
+    cache.put("total cases per country", CONTENT, "gpt-4o", 0.5, "Listed.")
+    with open(cache.path, encoding="utf-8") as cache_file:
+        assert "vector" not in json.dumps(json.load(cache_file))
+    assert os.path.exists(cache.vectors_path)
+
+    reloaded = ResponseCache(cache_dir=str(tmp_path), embedder=fake_embedder, similarity_threshold=0.99)
+    assert reloaded.get("per country total cases?", CONTENT, "gpt-4o", 0.5) == "Listed."
+    assert reloaded.get("per country total cases?", CONTENT, "gpt-4o", 0.5, history="Question: x") is None
+
+
+def test_repeated_question_skips_local_query_and_llm(handler):
+    computed = []
+
+    def compute(question):
+        computed.append(question)
+        return None
+
+    first = "".join(handler.stream_question(CONTENT, "How many countries?", compute))
+    handler.memory.clear()
+    second = "".join(handler.stream_question(CONTENT, "How many countries?", compute))
+    assert second == first.strip()
+    assert computed == ["How many countries?"]
+    assert CountingStub.calls == 1
+    assert handler.last_timing.cached
+
+
+def test_follow_up_after_different_history_is_not_served_from_cache(handler):
+    "".join(handler.stream_question(CONTENT, "Cases in France?"))
+    "".join(handler.stream_question(CONTENT, "And for the second file?"))
+    handler.memory.clear()
+    "".join(handler.stream_question(CONTENT, "Deaths in Spain?"))
+    "".join(handler.stream_question(CONTENT, "And for the second file?"))
+    assert CountingStub.calls == 4
+
+
+def test_stub_answers_are_not_served_to_the_real_model(tmp_path, handler):
+    "".join(handler.stream_question(CONTENT, "How many countries?"))
+    llm_client.set_llm_factory(None)
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    assert cache.get("How many countries?", CONTENT, "gpt-4o", 0.5) is None
@@ -0,0 +1,41 @@
+import os
+
+import pandas as pd
+
+from compaction import compact_dataframe
+from spelling import QuestionSpellChecker, vocabulary_from_frames
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ReplacingChecker:
+    """Dictionary that knows only a few words and "corrects" every other word to "wrong"."""
+    known = {"cases", "in", "how", "many"}
+
+    def unknown(self, words):
+        return {word for word in words if word not in self.known}
+
+    def correction(self, word):
+        return "wrong"
+
+
+def checker_for(frames):
+    spell_checker = QuestionSpellChecker()
+    spell_checker._checker = ReplacingChecker()
+    spell_checker.protect(vocabulary_from_frames(frames))
+    return spell_checker
+
+
+def test_values_of_unique_text_column_are_not_corrected():
+    df, _ = compact_dataframe(pd.read_csv(os.path.join(REPO_ROOT, "covid.csv")))
+    assert not isinstance(df["Country/other"].dtype, pd.CategoricalDtype)  # Every value is distinct
+    spell_checker = checker_for([df])
+    assert spell_checker.correct("How many cases in Tokelau?") == "How many cases in Tokelau?"
+    assert spell_checker.correct("cases in Vatican City") == "cases in Vatican City"
+
+
+def test_categorical_values_and_column_names_are_protected_and_other_words_corrected():
+    df = pd.DataFrame({"Region": pd.Categorical(["Oceania", "Oceania", "Europe"]), "Notes": ["x" * 200] * 3})
+    spell_checker = checker_for([df])
+    assert spell_checker.correct("region Oceania cases") == "region Oceania cases"
+    assert spell_checker.correct("Oceanai") == "wrong"
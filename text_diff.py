@@ -0,0 +1,192 @@
+import bisect
+import difflib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+# Gaps between patience anchors up to this many lines (per side) are diffed with difflib;
+# larger gaps without any line unique to both sides are reported as replaced wholesale
+EXACT_DIFF_LIMIT = 2000
+DEFAULT_CONTEXT_LINES = 2
+# Upper bound on the rendered diff, so a rewritten document cannot flood the summary
+DEFAULT_MAX_DIFF_CHARS = 4000
+
+Opcode = Tuple[str, int, int, int, int]  # (tag, i1, i2, j1, j2) as in difflib.SequenceMatcher
+
+
+def line_hashes(text: str) -> Tuple[List[str], List[int]]:
+    """Split text into lines and hash each one with its whitespace normalized.
+
+    The hashes are only compared within one process, so the built-in string hash is enough.
+    """
+    lines = text.splitlines()
+    return lines, [hash(" ".join(line.split())) for line in lines]
+
+
+def _unique_positions(hashes: Sequence[int], start: int, stop: int) -> Dict[int, int]:
+    """Position of every hash that occurs exactly once in hashes[start:stop]."""
+    positions: Dict[int, int] = {}
+    repeated = set()
+    for i in range(start, stop):
+        if hashes[i] in positions:
+            repeated.add(hashes[i])
+        else:
+            positions[hashes[i]] = i
+    for h in repeated:
+        del positions[h]
+    return positions
+
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Longest chain of pairs (sorted by first item) whose second items increase, in O(n log n)."""
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        position = bisect.bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[position] = j
+            tail_index[position] = k
+        previous[k] = tail_index[position - 1] if position else -1
+    chain = []
+    k = tail_index[-1] if tail_index else -1
+    while k >= 0:
+        chain.append(pairs[k])
+        k = previous[k]
+    return chain[::-1]
+
+
+def patience_opcodes(a: Sequence[int], b: Sequence[int]) -> List[Opcode]:
+    """Diff two sequences of line hashes with the patience algorithm.
+
+    Common leading and trailing lines are matched first; the rest is aligned on
+    lines that occur exactly once on each side, and the gaps between those anchors
+    are diffed the same way. Work and memory stay close to linear in the number of
+    lines: only gaps with no unique lines fall back to difflib, and only up to
+    EXACT_DIFF_LIMIT lines.
+    """
+    opcodes: List[Opcode] = []
+    # Explicit stack instead of recursion, so long documents cannot hit the recursion limit.
+    # Items are either a range to diff or an opcode that is already known.
+    stack: List[Union[Tuple[int, int, int, int], Opcode]] = [(0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 5:
+            opcodes.append(item)  # type: ignore[arg-type]
+            continue
+        a_lo, a_hi, b_lo, b_hi = item  # type: ignore[misc]
+
+        start_a, start_b = a_lo, b_lo
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            a_lo, b_lo = a_lo + 1, b_lo + 1
+        if a_lo > start_a:
+            opcodes.append(("equal", start_a, a_lo, start_b, b_lo))
+        end_a, end_b = a_hi, b_hi
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi, b_hi = a_hi - 1, b_hi - 1
+        suffix = ("equal", a_hi, end_a, b_hi, end_b)
+        if a_lo == a_hi or b_lo == b_hi:
+            opcodes.append(("replace", a_lo, a_hi, b_lo, b_hi))
+            opcodes.append(suffix)
+            continue
+
+        unique_a = _unique_positions(a, a_lo, a_hi)
+        unique_b = _unique_positions(b, b_lo, b_hi)
+        anchors = _longest_increasing(sorted((i, unique_b[h]) for h, i in unique_a.items() if h in unique_b))
+        if anchors:
+            pending: List[Union[Tuple[int, int, int, int], Opcode]] = []
+            for i, j in anchors:
+                if i > a_lo or j > b_lo:
+                    pending.append((a_lo, i, b_lo, j))
+                pending.append(("equal", i, i + 1, j, j + 1))
+                a_lo, b_lo = i + 1, j + 1
+            if a_lo < a_hi or b_lo < b_hi:
+                pending.append((a_lo, a_hi, b_lo, b_hi))
+            pending.append(suffix)
+            stack.extend(reversed(pending))  # Popped front to back
+            continue
+
+        if (a_hi - a_lo) > EXACT_DIFF_LIMIT or (b_hi - b_lo) > EXACT_DIFF_LIMIT:
+            opcodes.append(("replace", a_lo, a_hi, b_lo, b_hi))
+        else:
+            matcher = difflib.SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                opcodes.append((tag, a_lo + i1, a_lo + i2, b_lo + j1, b_lo + j2))
+        opcodes.append(suffix)
+    return _merge(opcodes)
+
+
+def _merge(opcodes: List[Opcode]) -> List[Opcode]:
+    """Drop empty opcodes, join neighbours of the same kind and name every change "replace"."""
+    merged: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i1 == i2 and j1 == j2:
+            continue
+        if tag != "equal":
+            tag = "replace"
+        if merged and merged[-1][0] == tag:
+            merged[-1] = (tag, merged[-1][1], i2, merged[-1][3], j2)
+        else:
+            merged.append((tag, i1, i2, j1, j2))
+    return merged
+
+
+@dataclass
+class TextHunk:
+    """A run of changes plus surrounding context, as zero-based half-open line ranges of both texts."""
+    start1: int
+    stop1: int
+    start2: int
+    stop2: int
+    changes: List[Opcode]
+
+    def render(self, lines1: Sequence[str], lines2: Sequence[str]) -> Iterator[str]:
+        """Unified-diff style lines: an @@ header, then "  " context, "- " removed and "+ " added lines."""
+        yield f"@@ -{self.start1 + 1},{self.stop1 - self.start1} +{self.start2 + 1},{self.stop2 - self.start2} @@"
+        position = self.start1
+        for _, i1, i2, j1, j2 in self.changes:
+            for i in range(position, i1):
+                yield f"  {lines1[i]}"
+            for i in range(i1, i2):
+                yield f"- {lines1[i]}"
+            for j in range(j1, j2):
+                yield f"+ {lines2[j]}"
+            position = i2
+        for i in range(position, self.stop1):
+            yield f"  {lines1[i]}"
+
+
+def diff_hunks(hashes1: Sequence[int], hashes2: Sequence[int], context: int = DEFAULT_CONTEXT_LINES) -> List[TextHunk]:
+    """Changed hunks between two hashed texts; changes closer than 2 * context lines share a hunk."""
+    hunks: List[TextHunk] = []
+    for change in patience_opcodes(hashes1, hashes2):
+        tag, i1, i2, j1, j2 = change
+        if tag == "equal":
+            continue
+        if hunks and i1 - hunks[-1].changes[-1][2] <= 2 * context:
+            hunks[-1].changes.append(change)
+        else:
+            lead = min(context, i1, j1)
+            hunks.append(TextHunk(i1 - lead, 0, j1 - lead, 0, [change]))
+    for hunk in hunks:
+        _, _, i2, _, j2 = hunk.changes[-1]
+        trail = min(context, len(hashes1) - i2, len(hashes2) - j2)
+        hunk.stop1, hunk.stop2 = i2 + trail, j2 + trail
+    return hunks
+
+
+def render_hunks(hunks: Sequence[TextHunk], lines1: Sequence[str], lines2: Sequence[str],
+                 max_chars: int = DEFAULT_MAX_DIFF_CHARS) -> List[str]:
+    """Render hunks until max_chars is reached, then note how much was left out."""
+    rendered: List[str] = []
+    used = 0
+    for number, hunk in enumerate(hunks):
+        for line in hunk.render(lines1, lines2):
+            if used + len(line) > max_chars:
+                rendered.append(f"... diff truncated; {len(hunks) - number} of {len(hunks)} hunks not fully shown")
+                return rendered
+            rendered.append(line)
+            used += len(line) + 1
+    return rendered
@@ -0,0 +1,70 @@
+import os
+import tempfile
+from collections import deque
+from typing import IO, Deque, List, Optional, Tuple
+
+# Turns kept in memory (and shown in the result pane) before the oldest are paged out
+DEFAULT_MAX_TURNS = int(os.environ.get("AI_ASSISTANT_RESULT_TURNS", 50))
+DEFAULT_MAX_CHARS = int(os.environ.get("AI_ASSISTANT_RESULT_CHARS", 200_000))
+
+
+class Transcript:
+    """Ring buffer of the turns shown in the result pane.
+
+    The newest turns stay in memory up to max_turns turns and max_chars characters
+    (the latest turn is always kept); older turns are appended to an anonymous
+    temporary file and read back on demand. Turns are numbered from 0 in the order
+    they were added.
+    """
+    def __init__(self, max_turns: int = DEFAULT_MAX_TURNS, max_chars: int = DEFAULT_MAX_CHARS):
+        self.max_turns: int = max_turns
+        self.max_chars: int = max_chars
+        self._recent: Deque[str] = deque()
+        self._recent_chars = 0
+        self._spill: Optional[IO[bytes]] = None
+        self._offsets: List[Tuple[int, int]] = []  # (offset, length) of every paged-out turn
+
+    def __len__(self) -> int:
+        return len(self._offsets) + len(self._recent)
+
+    @property
+    def paged_out(self) -> int:
+        """Number of turns on disk; turn numbers below this are read from the file."""
+        return len(self._offsets)
+
+    def append(self, text: str) -> int:
+        """Add a turn, paging out the oldest ones while over the caps; returns its number."""
+        self._recent.append(text)
+        self._recent_chars += len(text)
+        while len(self._recent) > 1 and (len(self._recent) > self.max_turns or self._recent_chars > self.max_chars):
+            self._page_out(self._recent.popleft())
+        return len(self) - 1
+
+    def read(self, start: int, stop: int) -> List[str]:
+        """Turns start..stop-1, from disk or memory."""
+        start, stop = max(start, 0), min(stop, len(self))
+        turns = []
+        for index in range(start, min(stop, self.paged_out)):
+            offset, length = self._offsets[index]
+            self._spill.seek(offset)
+            turns.append(self._spill.read(length).decode("utf-8"))
+        turns.extend(self._recent[index - self.paged_out] for index in range(max(start, self.paged_out), stop))
+        return turns
+
+    def close(self) -> None:
+        """Discard the paged-out turns."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._offsets.clear()
+        self._recent.clear()
+        self._recent_chars = 0
+
+    def _page_out(self, text: str) -> None:
+        self._recent_chars -= len(text)
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(prefix="ai-assistant-transcript-")  # Deleted once closed
+        data = text.encode("utf-8")
+        offset = self._spill.seek(0, os.SEEK_END)
+        self._spill.write(data)
+        self._offsets.append((offset, len(data)))
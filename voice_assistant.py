@@ -1,22 +1,78 @@
-import speech_recognition as sr
-import pyttsx3
-from langchain_openai import ChatOpenAI
+import re
 import threading
-from typing import Optional
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+from llm_client import get_llm
+from response_cache import normalize_question
+
+if TYPE_CHECKING:
+    import pyttsx3
+    import speech_recognition as sr
+    from langchain_openai import ChatOpenAI
+
+# Spoken filler that marks a transcript as needing rephrasing
+FILLER_PATTERN = re.compile(r"\b(um+|uh+|erm|hmm+|you know|i mean|kind of|sort of)\b|\blike,", re.IGNORECASE)
+REPEATED_WORD_PATTERN = re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE)
+QUESTION_START_PATTERN = re.compile(
+    r"^(what|which|who|whom|whose|when|where|why|how|is|are|was|were|do|does|did|can|could|"
+    r"should|would|will|has|have|list|show|give|compare|find|count|summarize|describe|tell)\b",
+    re.IGNORECASE,
+)
+STANDARDIZED_CACHE_SIZE = 256
+
+
+def is_well_formed(text: str) -> bool:
+    """Heuristic: text that already reads as a clear question or instruction needs no rephrasing."""
+    words = text.split()
+    if len(words) < 3 or FILLER_PATTERN.search(text) or REPEATED_WORD_PATTERN.search(text):
+        return False
+    return text.rstrip().endswith(("?", ".")) or bool(QUESTION_START_PATTERN.match(text.lstrip()))
+
 
 class VoiceAssistant:
     def __init__(self, language: str = "en-US"):
         self.language: str = language
-        self.llm: ChatOpenAI = ChatOpenAI(model="gpt-4o", temperature=0.7)
-        self.tts_engine: pyttsx3.Engine = pyttsx3.init()
+        self._tts_engine: Optional["pyttsx3.Engine"] = None
+        self.tts_thread: Optional[threading.Thread] = None
         self.stop_event: threading.Event = threading.Event()
+        # Standardized phrasings by normalized transcript, least recently used first
+        self._standardized: "OrderedDict[str, str]" = OrderedDict()
+        self._standardized_lock = threading.Lock()
+
+        # Audio devices are opened by initialize_audio on first voice use, not at start-up
+        self.microphone: Optional["sr.Microphone"] = None
+        self.recognizer: Optional["sr.Recognizer"] = None
+        self._audio_initialized: bool = False
+
+    @property
+    def llm(self) -> "ChatOpenAI":
+        """The shared chat client, created on first use."""
+        return get_llm(model="gpt-4o", temperature=0.7)
+
+    @property
+    def tts_engine(self) -> "pyttsx3.Engine":
+        """The text-to-speech engine, initialized the first time something is spoken."""
+        if self._tts_engine is None:
+            import pyttsx3
+            self._tts_engine = pyttsx3.init()
+        return self._tts_engine
 
-        self.microphone: Optional[sr.Microphone] = None
-        self.recognizer: Optional[sr.Recognizer] = None
+    def initialize_audio(self) -> None:
+        """Initialize the text-to-speech engine and the microphone, once.
+
+        Speech engine failures (OSError) propagate, so the caller can disable voice;
+        a missing microphone only disables listening.
+        """
+        if self._audio_initialized:
+            return
+        self.tts_engine  # Property access creates the engine now rather than on first speech
         self._initialize_microphone()
+        self._audio_initialized = True
 
     def _initialize_microphone(self) -> None:
         """Initialize microphone if available."""
+        import speech_recognition as sr  # Deferred so importing this module stays cheap
+
         try:
             self.microphone = sr.Microphone()
             self.recognizer = sr.Recognizer()
@@ -32,10 +88,13 @@ class VoiceAssistant:
 
     def listen(self) -> Optional[str]:
         """Capture voice input from the user and convert it to text."""
+        self.initialize_audio()
         if not self.microphone or not self.recognizer:
             print("Microphone is not available.")
             return None
 
+        import speech_recognition as sr
+
         with self.microphone as source:
             print("How can I help you?")
             self.speak("How can I help you?")
@@ -51,13 +110,30 @@ class VoiceAssistant:
         return None
 
     def standardize_language(self, text: Optional[str]) -> Optional[str]:
-        """Standardize the language of the given text using an LLM."""
+        """Standardize the language of the given text using an LLM.
+
+        Text that is already well formed is returned unchanged, and earlier results
+        are reused for transcripts that normalize to the same phrasing.
+        """
         if not text:
             return None
+        if is_well_formed(text):
+            return text
+
+        key = normalize_question(text)
+        with self._standardized_lock:
+            if key in self._standardized:
+                self._standardized.move_to_end(key)
+                return self._standardized[key]
 
         prompt = f"Please rephrase the following text in a more standard and formal language: '{text}'"
-        response = self.llm(prompt)
-        return response.content.strip()
+        response = self.llm.invoke(prompt)
+        standardized = response.content.strip()
+        with self._standardized_lock:
+            self._standardized[key] = standardized
+            if len(self._standardized) > STANDARDIZED_CACHE_SIZE:
+                self._standardized.popitem(last=False)
+        return standardized
 
     def speak(self, text: Optional[str]) -> None:
         """Convert the text to speech and play it back to the user."""
@@ -73,10 +149,12 @@ class VoiceAssistant:
         self.tts_thread = threading.Thread(target=tts)
         self.tts_thread.start()
 
-    def get_query(self) -> Optional[str]:
-        """Capture user's voice input, standardize it, and return the standardized text."""
+    def get_query(self, standardize: bool = True) -> Optional[str]:
+        """Capture user's voice input, standardize it (unless disabled), and return the text."""
         user_text = self.listen()
-        return self.standardize_language(user_text) if user_text else None
+        if not user_text:
+            return None
+        return self.standardize_language(user_text) if standardize else user_text
 
     def respond(self, response_text: str) -> None:
         """Respond to the user by speaking the text out loud."""